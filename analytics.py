@@ -0,0 +1,296 @@
+"""
+Historique des parties pour l'analyse (SQLite), alimenté à chaque fin de tour.
+
+Avant d'être remis à zéro (Prochaine nuit, Nouvelle partie), chaque tour est
+enregistré sous forme compacte, dans l'ordre des joueurs de la table :
+
+- roles      : un octet par joueur (indice du rôle dans base_roles)
+- votes      : la matrice N×N des votes, une ligne par votant et au plus une
+               voix par ligne : stockée comme vecteur uint16 (cible + 1, 0 = pas de vote)
+- eliminated : bitset des joueurs éliminés à la fin du tour
+
+Chaque ligne porte aussi les colonnes dérivées utiles aux requêtes (votants,
+égalité, rôle du joueur éliminé, Démons ayant voté, Démons d'accord), et les
+compteurs agrégés (table totals, par table et "*" pour l'ensemble) sont mis à
+jour dans la même transaction : les statistiques de la page admin se lisent
+sans parcourir les centaines de milliers de tours enregistrés.
+
+    python analytics.py stats [base]
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+
+from game import CAMP_EVIL, ROLE_INDEX, base_roles, day_victims, winning_camp
+
+ALL = "*"   # room_id des compteurs globaux
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    players INTEGER,
+    roles BLOB,
+    eliminated BLOB,
+    winner TEXT
+);
+CREATE INDEX IF NOT EXISTS games_open ON games (room_id, ended);
+
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    game_id INTEGER NOT NULL,
+    room_id TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    players INTEGER NOT NULL,
+    roles BLOB NOT NULL,
+    votes BLOB NOT NULL,
+    eliminated BLOB NOT NULL,
+    voters INTEGER NOT NULL,
+    tie INTEGER NOT NULL,
+    victim_role INTEGER,
+    demon_voters INTEGER NOT NULL,
+    demons_together INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rounds_game ON rounds (game_id, round);
+CREATE INDEX IF NOT EXISTS rounds_room ON rounds (room_id, ts);
+
+CREATE TABLE IF NOT EXISTS totals (
+    room_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (room_id, name)
+) WITHOUT ROWID;
+"""
+
+EVIL_INDEXES = frozenset(i for i, r in enumerate(base_roles) if r["camp"] == CAMP_EVIL)
+
+
+def bitset(joueurs, players) -> bytes:
+    bits = 0
+    for i, j in enumerate(joueurs):
+        if j in players:
+            bits |= 1 << i
+    return bits.to_bytes((len(joueurs) + 7) // 8, "little")
+
+
+def unpack_bitset(data: bytes, n: int):
+    bits = int.from_bytes(data, "little")
+    return [i for i in range(n) if bits >> i & 1]
+
+
+def role_vector(room):
+    """Indice du rôle (dans base_roles) de chaque joueur, dans l'ordre de la table."""
+    return [ROLE_INDEX[room.roles[j]["name"]] for j in room.joueurs]
+
+
+def round_record(room) -> dict:
+    """Tour en cours de la table (à appeler avant la remise à zéro), ou None sans vote."""
+    ledger = room.ledger
+    if not ledger.total_voters:
+        return None
+
+    joueurs = room.joueurs
+    position = {j: i for i, j in enumerate(joueurs)}
+    roles = role_vector(room)
+    votes = array("H", [0]) * len(joueurs)
+    for votant, cible in ledger.joueur_vote_pour.items():
+        votes[position[votant]] = position[cible] + 1
+
+    # résultat du dépouillement, s'il a été révélé
+    tie = False
+    victim_role = None
+    if room.reveal_results:
+        leaders = ledger.leaders()
+        tie = ledger.max_votes > 0 and len(leaders) > 1
+        if day_victims(ledger.max_votes, leaders, ()):
+            victim_role = roles[position[next(iter(leaders))]]
+
+    demon_targets = [votes[i] for i, r in enumerate(roles) if r in EVIL_INDEXES and votes[i]]
+    return {
+        "players": len(joueurs),
+        "roles": bytes(roles),
+        "votes": votes.tobytes(),
+        "eliminated": bitset(joueurs, room.eliminated_players),
+        "voters": ledger.total_voters,
+        "tie": int(tie),
+        "victim_role": victim_role,
+        "demon_voters": len(demon_targets),
+        "demons_together": int(len(demon_targets) >= 2 and len(set(demon_targets)) == 1),
+    }
+
+
+def game_record(room) -> dict:
+    """Fin de partie (avant reset_all) : rôles, éliminés et camp vainqueur (None si inachevée)."""
+    roles = role_vector(room)
+    alive = [i for i, j in enumerate(room.joueurs) if j not in room.eliminated_players]
+    evil_alive = sum(1 for i in alive if roles[i] in EVIL_INDEXES)
+    return {
+        "players": len(room.joueurs),
+        "roles": bytes(roles),
+        "eliminated": bitset(room.joueurs, room.eliminated_players),
+        "winner": winning_camp(len(alive), evil_alive),
+    }
+
+
+class AnalyticsStore:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # -------------------------------------------------
+    # ÉCRITURE
+    # -------------------------------------------------
+
+    def _open_game(self, conn, room_id: str, ts: float) -> int:
+        row = conn.execute(
+            "SELECT id FROM games WHERE room_id = ? AND ended IS NULL ORDER BY id DESC LIMIT 1", (room_id,),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        self._add(conn, room_id, {"games": 1})
+        return conn.execute("INSERT INTO games (room_id, started) VALUES (?, ?)", (room_id, ts)).lastrowid
+
+    def _add(self, conn, room_id: str, counts: dict):
+        rows = [(r, name, n) for name, n in counts.items() if n for r in (room_id, ALL)]
+        conn.executemany(
+            "INSERT INTO totals (room_id, name, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (room_id, name) DO UPDATE SET value = value + excluded.value",
+            rows,
+        )
+
+    def add_round(self, room_id: str, record: dict, ts: float = None):
+        ts = ts or time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            game_id = self._open_game(conn, room_id, ts)
+            (n,) = conn.execute("SELECT COUNT(*) FROM rounds WHERE game_id = ?", (game_id,)).fetchone()
+            conn.execute(
+                "INSERT INTO rounds (game_id, room_id, round, ts, players, roles, votes, eliminated,"
+                " voters, tie, victim_role, demon_voters, demons_together)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (game_id, room_id, n + 1, ts, record["players"], record["roles"], record["votes"],
+                 record["eliminated"], record["voters"], record["tie"], record["victim_role"],
+                 record["demon_voters"], record["demons_together"]),
+            )
+            victim = record["victim_role"]
+            self._add(conn, room_id, {
+                "rounds": 1,
+                "voters": record["voters"],
+                "players": record["players"],
+                "ties": record["tie"],
+                "victims": victim is not None,
+                "victims_demon": victim in EVIL_INDEXES,
+                "demon_rounds": record["demon_voters"] >= 2,
+                "demons_together": record["demons_together"],
+            })
+
+    def end_game(self, room_id: str, record: dict, ts: float = None):
+        ts = ts or time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            game_id = self._open_game(conn, room_id, ts)
+            conn.execute(
+                "UPDATE games SET ended = ?, players = ?, roles = ?, eliminated = ?, winner = ? WHERE id = ?",
+                (ts, record["players"], record["roles"], record["eliminated"], record["winner"], game_id),
+            )
+            winner = record["winner"]
+            if winner is None:
+                self._add(conn, room_id, {"games_unfinished": 1})
+                return
+            counts = {f"wins:{winner}": 1}
+            for r in record["roles"]:
+                won = (base_roles[r]["camp"] == winner)
+                counts[f"role_players:{r}"] = counts.get(f"role_players:{r}", 0) + 1
+                counts[f"role_wins:{r}"] = counts.get(f"role_wins:{r}", 0) + won
+            self._add(conn, room_id, counts)
+
+    # -------------------------------------------------
+    # LECTURE
+    # -------------------------------------------------
+
+    def totals(self, room_id: str = ALL) -> dict:
+        rows = self._conn().execute("SELECT name, value FROM totals WHERE room_id = ?", (room_id,))
+        return dict(rows.fetchall())
+
+    def summary(self, room_id: str = ALL) -> dict:
+        """Statistiques agrégées (compteurs, lecture en O(nombre de rôles))."""
+        t = self.totals(room_id)
+
+        def rate(num, den):
+            return t.get(num, 0) / t[den] if t.get(den) else None
+
+        finished = t.get("games", 0) - t.get("games_unfinished", 0) - self.open_games(room_id)
+        roles = []
+        for name, i in ROLE_INDEX.items():
+            players = t.get(f"role_players:{i}", 0)
+            roles.append({
+                "name": name,
+                "players": players,
+                "win_rate": t.get(f"role_wins:{i}", 0) / players if players else None,
+            })
+        return {
+            "games": t.get("games", 0),
+            "finished": finished,
+            "unfinished": t.get("games_unfinished", 0),
+            "rounds": t.get("rounds", 0),
+            "turnout": rate("voters", "players"),
+            "tie_rate": rate("ties", "rounds"),
+            "victim_demon_rate": rate("victims_demon", "victims"),
+            "demons_together_rate": rate("demons_together", "demon_rounds"),
+            "wins": {camp: t.get(f"wins:{camp}", 0) for camp in sorted({r["camp"] for r in base_roles})},
+            "roles": roles,
+        }
+
+    def open_games(self, room_id: str = ALL) -> int:
+        sql = "SELECT COUNT(*) FROM games WHERE ended IS NULL"
+        if room_id == ALL:
+            return self._conn().execute(sql).fetchone()[0]
+        return self._conn().execute(sql + " AND room_id = ?", (room_id,)).fetchone()[0]
+
+    def rounds(self, game_id: int):
+        """Tours d'une partie, décodés : (rôles, votes par votant ou None, indices éliminés)."""
+        rows = self._conn().execute(
+            "SELECT players, roles, votes, eliminated FROM rounds WHERE game_id = ? ORDER BY round", (game_id,),
+        )
+        for n, roles, votes, eliminated in rows:
+            v = array("H")
+            v.frombytes(votes)
+            yield list(roles), [x - 1 if x else None for x in v], unpack_bitset(eliminated, n)
+
+
+def stats(path: str):
+    store = AnalyticsStore(path)
+    s = store.summary()
+    print(f"{s['games']} parties ({s['finished']} terminées), {s['rounds']} tours")
+    for camp, n in s["wins"].items():
+        print(f"  victoires {camp:<20}{n}")
+    for r in s["roles"]:
+        if r["players"]:
+            print(f"  {r['name']:<16}{r['players']:>8} joueurs  {r['win_rate']:.1%} de victoires")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        stats(sys.argv[2] if len(sys.argv) > 2 else os.environ.get("ANALYTICS_DB", "instance/analytics.db"))
+    else:
+        print("usage: python analytics.py stats [base]")
@@ -1,199 +1,453 @@
 import os
-from flask import Flask, render_template, redirect, url_for, request, session, jsonify
-from functools import wraps
-import random
+from flask import Flask, render_template, redirect, url_for, request, session, jsonify, g, send_file, get_template_attribute
+from flask import before_render_template, template_rendered
+from flask.sessions import SecureCookieSessionInterface
+from flask_socketio import SocketIO, emit, join_room
+from jinja2 import FileSystemBytecodeCache
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+import time
 from flask import abort
 
+import analytics
+import checkpoint
+import eventlog
+from game import MAX_JOUEURS, MIN_JOUEURS, RELICS, ROOM_ID_RE, base_roles, player_ids
+from images import FORMATS, ImageDerivatives, fit_width
+from metrics import SIZE_BUCKETS, RecentSet, Registry
+from snapshots import FragmentCache, PatchHistory, SnapshotCache
+from storage import MemoryStore, open_store
+from streams import StreamHub
+
 app = Flask(__name__)
 
 app.secret_key = os.environ.get("SECRET_KEY", "dev_secret_key")
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "dev_password")
 SPECTATOR_KEY = os.environ.get("SPECTATOR_KEY", "")  # optionnel (recommandé)
+METRICS_KEY = os.environ.get("METRICS_KEY", "")  # optionnel : /metrics?key=...
 
-@app.route("/api/spectator_state")
-def api_spectator_state():
-    # Optionnel: sécuriser l’accès via ?key=...
-    if SPECTATOR_KEY:
-        if request.args.get("key") != SPECTATOR_KEY:
-            abort(403)
+# Table ouverte au démarrage (la page "/" y redirige)
+DEFAULT_ROOM = os.environ.get("DEFAULT_ROOM", "main")
 
-    total_voters = len(joueurs_ayant_vote)
-    all_voted = (total_voters == len(joueurs))
+# Nombre de joueurs d'une nouvelle table (l'admin peut le choisir : /r/<room>/admin?players=N)
+DEFAULT_PLAYERS = int(os.environ.get("DEFAULT_PLAYERS", 12))
 
-    max_votes_value = max(votes.values()) if votes else 0
-    top_voted_players = [j for j, v in votes.items() if v == max_votes_value] if max_votes_value > 0 else []
+# Grandes tables : grilles de joueurs et vues JSON paginées (?page=)
+PLAYERS_PER_PAGE = int(os.environ.get("PLAYERS_PER_PAGE", 48))
 
-    # On renvoie tout ce que le spectateur doit voir (y compris les rôles)
-    return jsonify({
-        "joueurs": joueurs,
-        "roles": roles,  # { "1": {"name":..., "icon":...}, ... }
-        "votes": votes,
-        "joueurs_ayant_vote": list(joueurs_ayant_vote),
-        "joueur_vote_pour": joueur_vote_pour,
-        "admin_started": admin_started,
-        "reveal_results": reveal_results,
-        "eliminated_players": list(eliminated_players),
-        "couple_players": list(couple_players),
-        "total_voters": total_voters,
-        "all_voted": all_voted,
-        "max_votes": max_votes_value,
-        "top_voted_players": top_voted_players,
+# Canal temps réel : les pages joueurs reçoivent un événement "state" à chaque
+# changement au lieu de poller /api/status (le polling reste le mode de repli).
+# SOCKETIO_ASYNC_MODE : threading | eventlet | gevent (vide = détection auto)
+# Plusieurs workers : SOCKETIO_MESSAGE_QUEUE (ex. redis://) relaie les événements entre eux.
+# Lié à l'application par create_app().
+socketio = SocketIO()
+
+# Client Socket.IO des pages : la copie locale static/socket.io.min.js si elle existe
+# (curl -o static/socket.io.min.js <CDN>), sinon le CDN, vérifié par son empreinte SRI.
+SOCKETIO_CLIENT = "socket.io.min.js"
+SOCKETIO_CLIENT_CDN = "https://cdn.socket.io/4.8.1/socket.io.min.js"
+SOCKETIO_CLIENT_SRI = "sha384-mkQ3/7FUtcGyoppY6bz/PORYoGqOl7/aSUMn2ymDOJcapfS6PHqxhRTMh1RR0Q6+"
+
+# Long-poll : durée maximale (s) pendant laquelle une requête ?since=&wait= est retenue
+LONG_POLL_MAX = 30
+LONG_POLL_STEP = 0.2
+
+# Toutes les tables, adressées par /r/<room>/... (backend choisi par STATE_BACKEND)
+rooms = None
+
+# Vues JSON déjà sérialisées (et compressées), par table et par version
+snapshots = SnapshotCache()
+
+# Dernières versions de chaque vue : ?from=<version> reçoit un patch au lieu de la vue complète
+history = PatchHistory(size=int(os.environ.get("PATCH_HISTORY", 16)))
+
+# Journal des événements (append-only) : EVENT_LOG="" le désactive.
+# Avec le backend memory, les tables sont reconstruites depuis le journal au démarrage.
+EVENT_LOG = os.environ.get("EVENT_LOG", os.path.join(app.instance_path, "events.log"))
+events = None
+
+# Checkpoint binaire des tables (backend memory) : écrit sur SIGTERM, rechargé au
+# démarrage pour qu'un redéploiement ne perde pas les parties. CHECKPOINT_PATH="" le désactive.
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", os.path.join(app.instance_path, "checkpoint.pickle"))
+
+# Historique des tours et des parties (page admin "Statistiques") : ANALYTICS_DB="" le désactive
+ANALYTICS_DB = os.environ.get("ANALYTICS_DB", os.path.join(app.instance_path, "analytics.db"))
+history_db = None
+
+# Fragments HTML (bandeau des rôles, grille et tableau admin), par sous-versions de l'état
+fragments = FragmentCache()
+
+# Déclinaisons des images (tailles / WebP) : cartes de rôles, dos de carte, fond
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR") or os.path.join(app.instance_path, "img_cache")
+images = None
+
+# Bytecode des templates compilés, relu par les workers suivants : TEMPLATE_CACHE_DIR="" le désactive
+TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR", os.path.join(app.instance_path, "jinja_cache"))
+
+
+# -----------------------------------------------------
+# MÉTRIQUES (/metrics, format Prometheus)
+# -----------------------------------------------------
+
+registry = Registry()
+
+REQUESTS = registry.counter("mgpr_http_requests_total", "Requêtes HTTP", ("endpoint", "method", "status"))
+LATENCY = registry.histogram("mgpr_http_request_duration_seconds", "Durée des requêtes", ("endpoint",))
+RESPONSE_SIZE = registry.histogram(
+    "mgpr_http_response_size_bytes", "Taille des réponses", ("endpoint",), buckets=SIZE_BUCKETS,
+)
+PHASES = registry.histogram(
+    "mgpr_phase_duration_seconds",
+    "Durée des étapes d'une requête : session, json (construction des vues), template",
+    ("phase", "endpoint"),
+)
+VOTES_CAST = registry.counter("mgpr_votes_total", "Votes enregistrés")
+SOCKET_CLIENTS = registry.gauge("mgpr_socket_clients", "Clients Socket.IO connectés")
+LONG_POLLS = registry.gauge("mgpr_long_polls_waiting", "Requêtes long-poll en attente d'un changement")
+
+# Endpoints pollés par les pages : un client = (table, endpoint, joueur, adresse)
+POLLED_ENDPOINTS = {"api_status", "api_spectator_state", "api_admin_state", "api_messages"}
+pollers = RecentSet(window=10)
+active_rooms = RecentSet(window=60)
+
+
+def pending_counts(room):
+    """Messages en attente d'une table : admin non lus, derniers mots non révélés au Nécromancien."""
+    return {"admin_unread": room.admin_messages.unread, "last_will_unrevealed": room.unrevealed_last_wills()}
+
+
+registry.gauge("mgpr_pollers", "Clients ayant pollé ces 10 dernières secondes", read=lambda: len(pollers))
+registry.gauge("mgpr_rooms", "Tables existantes", read=lambda: len(rooms))
+registry.gauge("mgpr_rooms_active", "Tables pollées cette dernière minute", read=lambda: len(active_rooms))
+registry.gauge(
+    "mgpr_sse_subscribers", "Abonnés au flux SSE spectateur",
+    read=lambda: spectator_streams.subscriber_count(),
+)
+# Tenue à jour par mutate() (variation de chaque table modifiée) : un scrape ne
+# parcourt aucune table. Par processus : avec un backend partagé, chaque worker
+# compte les variations qu'il a faites (somme des workers = total depuis leur démarrage).
+MESSAGES_PENDING = registry.gauge("mgpr_messages_pending", "Messages en attente", ("kind",))
+for _kind in ("admin_unread", "last_will_unrevealed"):
+    MESSAGES_PENDING.set(0, _kind)
 
-        # Optionnel: si tu veux aussi afficher les messages nécro côté spectateur
-        "necro_messages": necro_messages,
-    })
 
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """Cookie de session signé habituel ; mesure aussi son décodage et son écriture."""
 
-# Joueurs (1 à 12)
-joueurs = [str(i) for i in range(1, 13)]
-exorcised_player = None
-admin_messages = {j: [] for j in joueurs}
-admin_msg_next_id = 1
-
-# === LISTE DES RÔLES DE BASE ===
-base_roles = [
-    {
-        "name": "Enchanteresse",
-        "icon": "role_enchanteresse.png",
-        "icon_list": "role_enchanteresse2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": (
-            "Possède une relique de vie et une de mort. Chacune peut être utilisée une seule fois dans la partie, ou pas du tout."
-        ),
-    },
-    {
-        "name": "Démon",
-        "icon": "role_demon.png",
-        "icon_list": "role_demon2.png",
-        "camp": "Esprit Malfaiteur",
-        "description": "Chaque nuit les démons choisissent ensemble un joueur à éliminer.",
-    },
-    {
-        "name": "Sans visage",
-        "icon": "role_sans_visage.png",
-        "icon_list": "role_sans_visage2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "Chaque nuit, observe secrètement le groupe sans être vu.",
-    },
-    {
-        "name": "Cartomancienne",
-        "icon": "role_cartomancienne.png",
-        "icon_list": "role_cartomancienne2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "Chaque nuit, désigne un joueur pour connaître son camp",
-    },
-    {
-        "name": "Amant maudit",
-        "icon": "role_amant_maudit.png",
-        "icon_list": "role_amant_maudit2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "À la première nuit, lie deux joueurs comme amants. Si un membre du couple meurt, l'autre le suit dans la tombe. Il choisit un nouveau couple si le couple actuel meurt",
-    },
-    {
-        "name": "Esprit farceur",
-        "icon": "role_esprit_farceur.png",
-        "icon_list": "role_esprit_farceur2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "Une fois dans la partie, échange sa carte avec celle d’un autre joueur.",
-    },
-    {
-        "name": "Rédempteur",
-        "icon": "role_redempteur.png",
-        "icon_list": "role_redempteur2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "Chaque nuit, protège un joueur différent contre l’attaque des démons.",
-    },
-    {
-        "name": "Froussard",
-        "icon": "role_froussard.png",
-        "icon_list": "role_froussard2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "Chaque nuit, choisit un joueur derrière qui il se cache. S’il meurt, il meurt avec lui. Si les démons l'attaquent pendant qu'il est caché, il survit.",
-    },
-    {
-        "name": "Démon",
-        "icon": "role_demon.png",
-        "icon_list": "role_demon2.png",
-        "camp": "Esprit Malfaiteur",
-        "description": "Chaque nuit les démons choisissent ensemble un joueur à éliminer.",
-    },
-    {
-        "name": "Nécromancien",
-        "icon": "role_necromancien.png",
-        "icon_list": "role_necromancien2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "Après chaque tour, peut voir les dérnières volontés des morts",
-    },
-    {
-        "name": "Exorciste",
-        "icon": "role_exorciste.png",
-        "icon_list": "role_exorciste2.png",
-        "camp": "Esprit Bienfaiteur",
-        "description": "Chaque nuit, désigne un joueur pour le réduire au silence : il ne vote pas et ne participe pas au prochain rassemblement. Il ne peut pas être ciblé deux nuits de suite.",
-    },
-    {
-        "name": "Démon",
-        "icon": "role_demon.png",
-        "icon_list": "role_demon2.png",
-        "camp": "Esprit Malfaiteur",
-        "description": "Chaque nuit les démons choisissent ensemble un joueur à éliminer.",
-    },
-]
-
-if len(base_roles) != len(joueurs):
-    raise ValueError("Le nombre de rôles doit correspondre au nombre de joueurs.")
-
-# Rôles mélangés
-roles = {}
-
-# État du jeu
-votes = {j: 0 for j in joueurs}
-joueurs_ayant_vote = set()
-joueur_vote_pour = {}
-admin_started = False
-reveal_results = False
-eliminated_players = set()
-
-# Couple choisi par l'Amant maudit (contient 0 ou 2 joueurs)
-couple_players = set()
-
-# Messages des morts (pour Nécromancien)
-# Un message = {"id": int, "author": "2", "text": "...", "revealed": bool}
-necro_messages = []
-necro_next_id = 1
+    def open_session(self, app, request):
+        t0 = time.perf_counter()
+        sess = super().open_session(app, request)
+        # premier hook de la requête : sert aussi de départ pour sa durée totale
+        g.request_t0 = t0
+        g.session_time = time.perf_counter() - t0
+        return sess
+
+    def save_session(self, app, sess, response):
+        with PHASES.time("session_save", request.endpoint or "none"):
+            super().save_session(app, sess, response)
+
+
+app.session_interface = TimedSessionInterface()
+
+
+@before_render_template.connect_via(app)
+def template_started(sender, template, context, **extra):
+    g.template_t0 = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def template_finished(sender, template, context, **extra):
+    t0 = g.pop("template_t0", None)
+    if t0 is not None:
+        PHASES.observe(time.perf_counter() - t0, "template", request.endpoint or "none")
+
+
+@app.after_request
+def record_metrics(response):
+    # enregistré en premier : exécuté après les autres hooks after_request
+    endpoint = request.endpoint or "none"
+    t0 = g.get("request_t0")
+    if t0 is not None:
+        LATENCY.observe(time.perf_counter() - t0, endpoint)
+        PHASES.observe(g.session_time, "session_open", endpoint)
+    REQUESTS.inc(endpoint, request.method, response.status_code)
+    RESPONSE_SIZE.observe(response.content_length or 0, endpoint)
+
+    if endpoint in POLLED_ENDPOINTS and "room_id" in g:
+        player = request.args.get("votant") or (request.view_args or {}).get("joueur")
+        pollers.add((g.room_id, endpoint, player, request.remote_addr))
+        active_rooms.add(g.room_id)
+    return response
+
+
+@app.route("/metrics")
+def metrics():
+    if METRICS_KEY and request.args.get("key") != METRICS_KEY:
+        abort(403)
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+# -----------------------------------------------------
+# ROUTAGE PAR TABLE
+# -----------------------------------------------------
+
+@app.url_value_preprocessor
+def load_room(endpoint, values):
+    """Résout <room> en GameRoom (g.room) pour toutes les routes /r/<room>/..."""
+    if not values or "room" not in values:
+        return
+
+    room_id = values.pop("room")
+    # identifiant invalide : 404 avant tout endpoint (jamais de ValueError de rooms.create)
+    if not ROOM_ID_RE.match(room_id):
+        abort(404)
+    g.room_id = room_id
+    g.room = rooms.get(room_id)
+
+    if g.room is None:
+        # La table par défaut est créée à sa première visite, une autre table
+        # inconnue par l'admin (déjà connecté) ;
+        # la page de login reste accessible pour pouvoir s'authentifier.
+        is_admin = session.get("is_admin")
+        if room_id == DEFAULT_ROOM or is_admin:
+            g.room = create_room(room_id, request.args.get("players", type=int) if is_admin else None)
+        elif endpoint != "admin_login":
+            abort(404)
+
+
+@app.url_defaults
+def add_room(endpoint, values):
+    """url_for() complète <room> avec la table de la requête en cours."""
+    if "room" in values or "room_id" not in g:
+        return
+    if app.url_map.is_endpoint_expecting(endpoint, "room"):
+        values["room"] = g.room_id
+
+
+@app.context_processor
+def inject_room():
+    return {"room_id": g.get("room_id")}
+
+
+@app.template_global()
+@lru_cache(maxsize=None)
+def socketio_client():
+    """(src, integrity) du script Socket.IO : copie locale si présente, sinon le CDN."""
+    if os.path.exists(os.path.join(app.static_folder, SOCKETIO_CLIENT)):
+        return url_for("static", filename=SOCKETIO_CLIENT), None
+    return SOCKETIO_CLIENT_CDN, SOCKETIO_CLIENT_SRI
+
+
+@app.template_global()
+def img_url(name: str, width: int, fmt: str = "webp"):
+    """
+    URL d'une image de static/ déclinée à `width` pixels réels : les templates
+    passent environ le double de la largeur CSS (écrans denses), pas de x2 ici.
+    """
+    if not images.available or name not in images.sources:
+        return url_for("static", filename=name)
+    return url_for("role_image", width=fit_width(width), fmt=fmt, name=name, v=images.source_hash(name)[:10])
 
 
 # -----------------------------------------------------
 # UTILITAIRES
 # -----------------------------------------------------
 
-def assign_random_roles():
-    global roles
-    shuffled = base_roles.copy()
-    random.shuffle(shuffled)
-    roles = {joueurs[i]: shuffled[i] for i in range(len(joueurs))}
+def public_state(room):
+    """État visible par tous les joueurs (poussé sur le socket)."""
+    return {
+        "reveal": room.reveal_results,
+        "all_voted": room.ledger.total_voters == len(room.joueurs),
+        "admin_started": room.admin_started,
+        "eliminated_players": list(room.eliminated_players),
+    }
+
 
+def broadcast_state(room):
+    """Envoie l'état courant à tous les clients abonnés à la table."""
+    socketio.emit("state", public_state(room), to=room.room_id)
 
-def get_lover_partner(player_id: str):
-    """Retourne l'autre amoureux si player_id est dans le couple."""
-    if player_id in couple_players and len(couple_players) == 2:
-        for p in couple_players:
-            if p != player_id:
-                return p
-    return None
 
+@contextmanager
+def mutate():
+    """Transaction sur la table de la requête : `with mutate() as room: ...`"""
+    with rooms.transaction(g.room_id) as room:
+        before = pending_counts(room)
+        try:
+            yield room
+        finally:
+            for kind, n in pending_counts(room).items():
+                if n != before[kind]:
+                    MESSAGES_PENDING.inc(kind, amount=n - before[kind])
 
-def get_necromancer():
-    """Retourne le numéro du joueur qui est Nécromancien, ou None."""
-    for j, r in roles.items():
-        if r["name"] == "Nécromancien":
-            return j
-    return None
 
+def bump_state(room, event: str, **data):
+    """
+    À appeler (dans mutate()) après chaque modification de l'état : nouvelle
+    version, et événement `event` (données `data`) pour le journal.
+    """
+    room.version += 1
+    snapshots.invalidate(room.room_id)
+    g.changed_room = room
+    g.setdefault("events", []).append((room.room_id, room.version, event, data))
 
-def player_has_last_will(joueur: str) -> bool:
-    """True si ce joueur a déjà écrit une dernière volonté."""
-    return any(m["author"] == joueur for m in necro_messages)
+
+def archive_round(room, game_over: bool = False):
+    """
+    À appeler (dans mutate()) avant de remettre les votes à zéro : le tour, et
+    la partie si elle se termine, sont enregistrés pour les statistiques.
+    """
+    if history_db is None:
+        return
+    pending = g.setdefault("analytics", [])
+    record = analytics.round_record(room)
+    if record is not None:
+        pending.append((history_db.add_round, room.room_id, record))
+    if game_over:
+        pending.append((history_db.end_game, room.room_id, analytics.game_record(room)))
+
+
+def create_room(room_id: str, players: int = None):
+    """Crée la table (si besoin) avec `players` joueurs et journalise sa création."""
+    if room_id in rooms:
+        return rooms.get(room_id)
+    players = min(max(players or DEFAULT_PLAYERS, MIN_JOUEURS), MAX_JOUEURS)
+    room = rooms.create(room_id, player_ids(players))
+    if events:
+        events.append(room_id, room.version, "create", {"joueurs": room.joueurs, "roles": room.role_indexes()})
+    return room
+
+
+@app.after_request
+def broadcast_changes(response):
+    # journal et diffusion une fois la transaction enregistrée
+    if events:
+        for e in g.pop("events", ()):
+            events.append(*e)
+        if events.snapshot_due:
+            events.snapshot_in_background(rooms)
+
+    room = g.pop("changed_room", None)
+    if room is not None:
+        broadcast_state(room)
+
+    for write, room_id, record in g.pop("analytics", ()):
+        write(room_id, record)
+    return response
+
+
+def wait_for_change(room_id: str, since: int, timeout: float):
+    """Retient la requête tant que la version vaut encore `since` (au plus `timeout` s)."""
+    deadline = time.monotonic() + timeout
+    LONG_POLLS.inc()
+    try:
+        while not draining and rooms.version(room_id) == since and time.monotonic() < deadline:
+            socketio.sleep(LONG_POLL_STEP)
+    finally:
+        LONG_POLLS.dec()
+
+
+def view_snapshot(room, view, arg, build, base=None, endpoint=None):
+    """
+    (Snapshot, est un patch) de la vue (view, arg) à la version de `room` ;
+    build(room) -> dict. Avec `base`, patch depuis cette version si elle est
+    encore dans l'historique.
+    """
+    version = room.version
+
+    def serialize():
+        with PHASES.time("json", endpoint):
+            payload = build(room)
+            payload["version"] = version
+            body = app.json.dumps(payload).encode()
+        history.record(room.room_id, (view, arg), version, body)
+        return body
+
+    snap = snapshots.get(room.room_id, (view, arg), version, serialize)
+    if base is None or base == version:
+        return snap, False
+
+    patch = history.patch(room.room_id, (view, arg), base, version)
+    if patch is None:
+        return snap, False  # client trop en retard : vue complète
+    # un patch par version de départ, partagé comme la vue complète
+    return snapshots.get(room.room_id, (view, arg, base), version, lambda: app.json.dumps(patch).encode()), True
+
+
+def versioned_json(view, build, arg=None):
+    """
+    Réponse JSON versionnée pour les endpoints pollés ; build(room) -> dict.
+    - ?since=<version>&wait=<s> : long-poll jusqu'au prochain changement
+    - If-None-Match : 304 sans reconstruire le payload si rien n'a changé
+    - ?from=<version> : patch depuis cette version ({"from", "version", "patch"}),
+      ou la vue complète si elle n'est plus dans l'historique
+    - sinon, octets pré-sérialisés (et gzip) partagés par tous les clients
+      de la même vue (view, arg) jusqu'à la prochaine modification
+    """
+    room = g.room
+    since = request.args.get("since", type=int)
+    if since is not None:
+        wait = min(request.args.get("wait", 0, type=float), LONG_POLL_MAX)
+        wait_for_change(g.room_id, since, max(wait, 0))
+        room = rooms.get(g.room_id)
+
+    version = room.version
+    etag = f"v{version}"
+
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        snap, _ = view_snapshot(room, view, arg, build, request.args.get("from", type=int), request.endpoint)
+
+        if snap.gzipped is not None and "gzip" in request.accept_encodings:
+            response = app.response_class(snap.gzipped, mimetype="application/json")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = app.response_class(snap.body, mimetype="application/json")
+        response.vary.add("Accept-Encoding")
+
+    # ETag faible : identique pour les variantes gzip / non compressée
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def player_page(joueurs, page):
+    """(joueurs de la page, page, nombre de pages) ; page=None : tous les joueurs."""
+    if page is None:
+        return joueurs, 1, 1
+    pages = max(1, -(-len(joueurs) // PLAYERS_PER_PAGE))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * PLAYERS_PER_PAGE
+    return joueurs[start:start + PLAYERS_PER_PAGE], page, pages
+
+
+def page_members(players: set, joueurs, paged: bool):
+    """Joueurs de `players` présents sur la page (tous si la vue n'est pas paginée)."""
+    if not paged:
+        return list(players)
+    return [j for j in joueurs if j in players]
+
+
+def render_public_result(room, votant):
+    max_votes, winners = room.top_voted()
+
+    # Mapping amoureux pour l'affichage
+    lover_map = room.lover_map()
+    reveal_couple = any(w in room.couple_players for w in winners)
+
+    return render_template(
+        "public_result.html",
+        votes=room.votes,
+        winners=winners,
+        max_votes=max_votes,
+        votant=votant,
+        roles=room.roles,
+        joueur_vote_pour=room.joueur_vote_pour,
+        lover_map=lover_map,
+        reveal_couple=reveal_couple,
+        couple_players=room.couple_players,
+    )
 
 
 def admin_required(fn):
@@ -210,112 +464,133 @@ def admin_required(fn):
 # -----------------------------------------------------
 
 @app.route("/")
-def select_player():
-    return render_template("select_player.html", joueurs=joueurs)
+def index():
+    return redirect(url_for("select_player", room=DEFAULT_ROOM))
 
 
-@app.route("/vote/<votant>")
-def vote_page(votant):
+@app.route("/r/<room>/")
+def select_player():
+    joueurs, page, pages = player_page(g.room.joueurs, request.args.get("page", 1, type=int))
+    return render_template("select_player.html", joueurs=joueurs, page=page, pages=pages)
 
-    if votant not in joueurs:
-        return "Joueur inconnu", 404
 
-    if votant in eliminated_players:
-        already_sent = player_has_last_will(votant)
-        return render_template("eliminated.html", votant=votant, already_sent=already_sent)
-        # Joueur exorcisé : ne peut pas voter ce tour
-    if exorcised_player == votant and admin_started:
-        return render_template("waiting.html", votant=votant, role=None)
+def render_fragment(room, name, key, macro, *args):
+    """Fragment HTML de _fragments.html, re-rendu seulement si `key` a changé."""
+    return fragments.get(
+        room.room_id, name, key,
+        lambda: get_template_attribute("_fragments.html", macro)(*args),
+    )
 
 
-    if not admin_started:
-        # 1 entrée par joueur (donc 12 icônes, dont 3 démons)
-        roles_state_list = []
-        for j in joueurs:
-            r = roles.get(j)
-            if not r:
+def role_items(room):
+    """
+    Une icône (HTML) par rôle en jeu pour le bandeau de welcome.html, avec le
+    nombre de joueurs et de morts : une dizaine d'icônes même à 300 joueurs.
+    """
+    def render():
+        macro = get_template_attribute("_fragments.html", "role_item")
+        dead_bits = room.eliminated_players.bits
+        items = []
+        for r, bits in zip(base_roles, room.role_players):
+            if not bits:
                 continue
-            roles_state_list.append({
-                "player": j,
+            items.append(macro({
                 "name": r["name"],
                 "icon_list": r.get("icon_list") or r.get("icon"),
-                "eliminated": (j in eliminated_players),
-            })
+                "count": bits.bit_count(),
+                "dead": (bits & dead_bits).bit_count(),
+            }))
+        return items
 
-        # ordre aléatoire à chaque rendu
-        random.shuffle(roles_state_list)
+    key = (room.roles_version, room.eliminated_version)
+    return fragments.get(room.room_id, "role_items", key, render)
 
-        return render_template("welcome.html", votant=votant, roles_state=roles_state_list, roles=roles)
 
+@app.route("/r/<room>/vote/<votant>")
+def vote_page(votant):
+    room = g.room
 
+    if votant not in room.joueurs:
+        return "Joueur inconnu", 404
 
-    if votant in joueurs_ayant_vote:
+    if votant in room.eliminated_players:
+        already_sent = room.player_has_last_will(votant)
+        return render_template("eliminated.html", votant=votant, already_sent=already_sent)
+        # Joueur exorcisé : ne peut pas voter ce tour
+    if room.exorcised_player == votant and room.admin_started:
+        return render_template("waiting.html", votant=votant, role=None)
+
+
+    if not room.admin_started:
+        # 1 entrée par rôle en jeu (Démon x3...), quelle que soit la taille de la table
+        return render_template(
+            "welcome.html", votant=votant, roles_state=role_items(room), roles=room.roles,
+            eliminated_count=len(room.eliminated_players),
+        )
 
-        if reveal_results:
-            max_votes = max(votes.values()) if votes else 0
-            winners = [j for j, v in votes.items() if v == max_votes]
 
-            # Mapping amoureux pour l'affichage
-            lover_map = {}
-            if len(couple_players) == 2:
-                cp = list(couple_players)
-                lover_map[cp[0]] = cp[1]
-                lover_map[cp[1]] = cp[0]
 
-            reveal_couple = any(w in couple_players for w in winners)
+    if votant in room.joueurs_ayant_vote:
 
-            return render_template(
-                "public_result.html",
-                votes=votes,
-                winners=winners,
-                max_votes=max_votes,
-                votant=votant,
-                roles=roles,
-                joueur_vote_pour=joueur_vote_pour,
-                lover_map=lover_map,
-                reveal_couple=reveal_couple,
-                couple_players=couple_players,
-            )
+        if room.reveal_results:
+            return render_public_result(room, votant)
 
         return render_template("waiting.html", votant=votant, role=None)
 
-    lover_partner = get_lover_partner(votant)
+    lover_partner = room.get_lover_partner(votant)
+    joueurs, page, pages = player_page(room.joueurs, request.args.get("page", 1, type=int))
 
     return render_template(
         "index.html",
         votant=votant,
         joueurs=joueurs,
-        eliminated_players=eliminated_players,
-        roles=roles,
+        page=page,
+        pages=pages,
+        eliminated_players=room.eliminated_players,
+        roles=room.roles,
         lover_partner=lover_partner,
+        inspection=room.inspections.get(votant),
     )
 
-@app.route("/api/messages/<joueur>")
+@app.route("/r/<room>/api/messages/<joueur>")
 def api_messages(joueur):
-    if joueur not in joueurs:
+    room = g.room
+    if joueur not in room.joueurs:
         abort(404)
 
-    msgs = admin_messages.get(joueur, [])
-    unread = any(not m["read"] for m in msgs)
+    # ?after=<id> : seulement les messages arrivés depuis le dernier poll
+    after = request.args.get("after", 0, type=int)
+    board = room.admin_messages
+    read_upto = board.read_upto.get(joueur, 0)
 
     return jsonify({
-        "messages": msgs,
-        "has_unread": unread
+        "messages": [
+            {"id": m.id, "text": m.text, "audience": m.audience, "read": m.id <= read_upto}
+            for m in board.for_player(joueur, after)
+        ],
+        "last_id": board.last_id(joueur),
+        "has_unread": board.has_unread(joueur),
     })
 
-@app.route("/api/messages/<joueur>/read", methods=["POST"])
+@app.route("/r/<room>/api/messages/<joueur>/read", methods=["POST"])
 def api_messages_read(joueur):
-    if joueur not in joueurs:
+    room = g.room
+    if joueur not in room.joueurs:
         abort(404)
 
-    for m in admin_messages.get(joueur, []):
-        m["read"] = True
+    # ?upto=<id> : dernier message affiché (ceux arrivés depuis restent non lus)
+    upto = request.args.get("upto", type=int)
+    with mutate() as room:
+        if room.mark_messages_read(joueur, upto):
+            bump_state(room, "read", joueur=joueur, upto=upto)
 
     return jsonify({"ok": True})
 
-@app.route("/admin/message", methods=["GET", "POST"])
+@app.route("/r/<room>/admin/message", methods=["GET", "POST"])
 @admin_required
 def admin_message():
+    room = g.room
+
     if request.method == "POST":
         target = request.form.get("target", "single")  # single | all | demons
         joueur = request.form.get("joueur")           # utilisé si single
@@ -324,372 +599,344 @@ def admin_message():
         if not text:
             return redirect(url_for("admin_dashboard"))
 
-        if target == "all":
-            push_admin_message(joueurs, text)
-
-        elif target == "demons":
-            demon_players = get_players_by_role("Démon")
-            push_admin_message(demon_players, text)
-
-        else:
-            # single
-            if joueur in joueurs:
-                push_admin_message([joueur], text)
-
-        return redirect(url_for("admin_dashboard"))
-
-    return render_template("admin_message.html", joueurs=joueurs)
+        with mutate() as room:
+            if target == "all":
+                players = room.joueurs
 
-def get_players_by_role(role_name: str):
-    """Retourne la liste des joueurs dont le rôle (name) correspond."""
-    return [j for j, r in roles.items() if r and r.get("name") == role_name]
+            elif target == "demons":
+                players = room.get_players_by_role("Démon")
 
-def push_admin_message(target_players, text: str):
-    """Ajoute un message admin à une liste de joueurs."""
-    global admin_msg_next_id
-    for j in target_players:
-        if j in joueurs:
-            admin_messages[j].append({
-                "id": admin_msg_next_id,
-                "text": text,
-                "read": False,
-            })
-            admin_msg_next_id += 1
-
-def admin_message():
-    global admin_msg_next_id
-
-    if request.method == "POST":
-        joueur = request.form.get("joueur")
-        text = request.form.get("message", "").strip()
+            else:
+                # single
+                target = "single"
+                players = [joueur] if joueur in room.joueurs else []
 
-        if joueur in joueurs and text:
-            admin_messages[joueur].append({
-                "id": admin_msg_next_id,
-                "text": text,
-                "read": False,
-            })
-            admin_msg_next_id += 1
+            if room.push_admin_message(target, players, text):
+                bump_state(room, "message", audience=target, players=list(players), text=text)
 
         return redirect(url_for("admin_dashboard"))
 
-    return render_template("admin_message.html", joueurs=joueurs)
+    return render_template("admin_message.html", joueurs=room.joueurs)
 
 
 
 
-@app.route("/vote/<votant>/<cible>")
+@app.route("/r/<room>/vote/<votant>/<cible>")
 def vote(votant, cible):
 
-    if votant not in joueurs or cible not in joueurs:
-        return "Joueur inconnu", 404
+    with mutate() as room:
+        if votant not in room.joueurs or cible not in room.joueurs:
+            return "Joueur inconnu", 404
 
-    if votant in eliminated_players:
-        already_sent = player_has_last_will(votant)
-        return render_template("eliminated.html", votant=votant, already_sent=already_sent)
+        eliminated = votant in room.eliminated_players
+        if not eliminated:
+            if votant == cible:
+                return "Impossible de voter pour vous-même", 400
 
-    if votant == cible:
-        return "Impossible de voter pour vous-même", 400
+            if cible in room.eliminated_players:
+                return redirect(url_for("vote_page", votant=votant))
 
-    if cible in eliminated_players:
-        return redirect(url_for("vote_page", votant=votant))
-
-    if votant in joueurs_ayant_vote:
-        return redirect(url_for("vote_page", votant=votant))
-    
-    if exorcised_player == votant:
-        return "Vous êtes exorcisé et ne pouvez pas voter ce tour.", 403
+            if votant in room.joueurs_ayant_vote:
+                return redirect(url_for("vote_page", votant=votant))
 
-    joueur_vote_pour[votant] = cible
-    votes[cible] += 1
-    joueurs_ayant_vote.add(votant)
+            if room.exorcised_player == votant:
+                return "Vous êtes exorcisé et ne pouvez pas voter ce tour.", 403
 
-    if reveal_results:
-        max_votes = max(votes.values()) if votes else 0
-        winners = [j for j, v in votes.items() if v == max_votes]
+            # atomique : un vote concurrent du même joueur n'est jamais compté deux fois
+            if not room.cast_vote(votant, cible):
+                return redirect(url_for("vote_page", votant=votant))
+            bump_state(room, "vote", votant=votant, cible=cible)
+            VOTES_CAST.inc()
 
-        lover_map = {}
-        if len(couple_players) == 2:
-            cp = list(couple_players)
-            lover_map[cp[0]] = cp[1]
-            lover_map[cp[1]] = cp[0]
+    # pages rendues hors transaction : avec STATE_BACKEND=sqlite, le verrou
+    # d'écriture (BEGIN IMMEDIATE) n'est pas gardé pendant le rendu Jinja
+    if eliminated:
+        return render_template("eliminated.html", votant=votant, already_sent=room.player_has_last_will(votant))
 
-        reveal_couple = any(w in couple_players for w in winners)
-
-        return render_template(
-            "public_result.html",
-            votes=votes,
-            winners=winners,
-            max_votes=max_votes,
-            votant=votant,
-            roles=roles,
-            joueur_vote_pour=joueur_vote_pour,
-            lover_map=lover_map,
-            reveal_couple=reveal_couple,
-            couple_players=couple_players,
-        )
+    if room.reveal_results:
+        return render_public_result(room, votant)
 
     return render_template("waiting.html", votant=votant, role=None)
 
 
-@app.route("/role/<votant>")
+@app.route("/r/<room>/role/<votant>")
 def view_role(votant):
+    room = g.room
 
-    if votant not in joueurs:
+    if votant not in room.joueurs:
         return "Joueur inconnu", 404
 
-    role = roles.get(votant)
-    if role is None:
+    if room.roles.get(votant) is None:
         return "Rôle inconnu", 404
 
-    lover_partner = get_lover_partner(votant)
+    return render_role(room, votant)
+
+
+def render_role(room, votant, night_error=None):
+    """Page du rôle, avec le formulaire d'action de nuit du joueur tant que la nuit dure."""
+    role = room.roles[votant]
+    lover_partner = room.get_lover_partner(votant)
+
+    night_kind = None
+    if not room.admin_started and votant not in room.eliminated_players:
+        night_kind = room.night_kind(votant)
 
     return render_template(
         "role.html",
         votant=votant,
         role=role,
         lover_partner=lover_partner,
-        admin_started=admin_started,
-    )
-
-
-@app.route("/api/status")
-def api_status():
-
-    votant = request.args.get("votant")
+        admin_started=room.admin_started,
+        night_kind=night_kind,
+        night_action=room.night_actions.get(votant),
+        inspection=room.inspections.get(votant),
+        night_targets=[j for j in room.joueurs if j not in room.eliminated_players],
+        relics_left=[r for r in RELICS if r not in room.relics_used.get(votant, ())],
+        night_error=night_error,
+    ), 400 if night_error else 200
+
+
+@app.route("/r/<room>/night/<joueur>", methods=["POST"])
+def night_action(joueur):
+    """Action de nuit d'un joueur, résolue avec les autres au Start (resolve_night)."""
+    if joueur not in g.room.joueurs:
+        return "Joueur inconnu", 404
 
-    return jsonify({
-        "reveal": reveal_results,
-        "all_voted": len(joueurs_ayant_vote) == len(joueurs),
-        "eliminated": votant in eliminated_players if votant else False,
-        "admin_started": admin_started,
-    })
+    with mutate() as room:
+        kind = room.night_kind(joueur)
+        action = {"kind": kind}
+        if kind == "couple":
+            action["targets"] = [request.form.get("target"), request.form.get("target2")]
+        else:
+            action["target"] = request.form.get("target")
+        if kind == "relic":
+            action["relic"] = request.form.get("relic")
 
+        # vérifiée sous verrou : la nuit a pu se terminer entre-temps
+        error = room.check_night_action(joueur, action)
+        if error is None:
+            room.set_night_action(joueur, action)
+            bump_state(room, "night_action", joueur=joueur, action=action)
 
-# -----------------------------------------------------
-# PAGE LISTE DES RÔLES
-# -----------------------------------------------------
+    if error is not None:
+        return render_role(room, joueur, error)
+    return redirect(url_for("view_role", votant=joueur))
 
-@app.route("/roles")
-def roles_list():
-    unique_by_name = {}
-    for r in base_roles:
-        unique_by_name.setdefault(r["name"], r)
 
-    previous_url = request.referrer or url_for("select_player")
+@app.route("/r/<room>/api/status")
+def api_status():
+    votant = request.args.get("votant")
+    if votant not in g.room.joueurs:
+        votant = None  # une seule vue en cache pour les identifiants inconnus
 
-    return render_template("roles_list.html", roles=list(unique_by_name.values()), previous_url=previous_url)
+    return versioned_json("status", lambda room: {
+        "reveal": room.reveal_results,
+        "all_voted": room.ledger.total_voters == len(room.joueurs),
+        "eliminated": votant in room.eliminated_players if votant else False,
+        "admin_started": room.admin_started,
+    }, arg=votant)
 
 
 # -----------------------------------------------------
-# RESET
+# IMAGES REDIMENSIONNÉES
 # -----------------------------------------------------
 
-def reset_votes_only():
-    """
-    Remet les votes à zéro, permet de relancer un tour de vote
-    sans changer les rôles ni les joueurs éliminés.
-    """
-    global votes, joueurs_ayant_vote, joueur_vote_pour, reveal_results
+@app.route("/img/<int:width>/<fmt>/<name>")
+def role_image(width, fmt, name):
+    if name not in images.sources or fmt not in FORMATS:
+        abort(404)
 
-    votes = {j: 0 for j in joueurs}
-    joueurs_ayant_vote.clear()
-    joueur_vote_pour.clear()
-    reveal_results = False  # on cache les anciens résultats
+    if not images.available:
+        return redirect(url_for("static", filename=name))
 
+    # ?v=<empreinte> (posé par img_url) : l'URL change avec l'image, cache "immutable"
+    versioned = request.args.get("v") == images.source_hash(name)[:10]
+    max_age = 31536000 if versioned else 86400
 
-def reset_all():
-    """
-    Nouvelle partie complète : nouveaux rôles, plus aucun éliminé,
-    messages de morts effacés.
-    """
-    global votes, joueurs_ayant_vote, joueur_vote_pour, admin_started, reveal_results
-    global eliminated_players, couple_players, necro_messages, necro_next_id
-    global admin_messages, admin_msg_next_id, exorcised_player
+    # une déclinaison peut être évincée du cache entre path() et son ouverture :
+    # elle est alors regénérée (une fois), sinon on sert l'original
+    for _ in range(2):
+        try:
+            response = send_file(images.path(name, width, fmt), mimetype=FORMATS[fmt][1], max_age=max_age)
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return redirect(url_for("static", filename=name))
+
+    if versioned:
+        response.cache_control.immutable = True
+    return response
 
-    reset_votes_only()
-    eliminated_players.clear()
-    couple_players.clear()
 
-    necro_messages.clear()
-    necro_next_id = 1
-    admin_messages = {j: [] for j in joueurs}
-    admin_msg_next_id = 1
+# -----------------------------------------------------
+# PAGE LISTE DES RÔLES
+# -----------------------------------------------------
 
-    exorcised_player = None
-    admin_started = False
-    reveal_results = False
-    assign_random_roles()
+@app.route("/r/<room>/roles")
+def roles_list():
+    unique_by_name = {}
+    for r in base_roles:
+        unique_by_name.setdefault(r["name"], r)
 
+    previous_url = request.referrer or url_for("select_player")
 
-def reset_round_keep_eliminated():
-    global admin_started, exorcised_player
-    reset_votes_only()
-    admin_started = False
-    exorcised_player = None   # l’exorcisme ne dure qu’un tour
+    return render_template("roles_list.html", roles=list(unique_by_name.values()), previous_url=previous_url)
 
 
 # -----------------------------------------------------
 # ADMIN
 # -----------------------------------------------------
-@app.route("/reset")
+@app.route("/r/<room>/reset")
 def reset():
     """
     Nouvelle partie déclenchée depuis un client (admin ou joueur).
     Utilise reset_all() puis redirige au bon endroit.
     """
     votant = request.args.get("votant")
-    reset_all()
+    with mutate() as room:
+        archive_round(room, game_over=True)
+        room.reset_all()
+        bump_state(room, "reset", roles=room.role_indexes())
 
     # Si c'est l'admin, retour au dashboard
     if session.get("is_admin"):
         return redirect(url_for("admin_dashboard"))
 
     # Si un joueur a appelé /reset?votant=3
-    if votant in joueurs:
+    if votant in room.joueurs:
         return redirect(url_for("vote_page", votant=votant))
 
     # Fallback : page de sélection de joueur
     return redirect(url_for("select_player"))
 
 
-@app.route("/admin/result")
+@app.route("/r/<room>/admin/result")
 @admin_required
 def admin_result():
     """Page récapitulant les votes détaillés côté admin."""
-    max_votes = max(votes.values()) if votes else 0
-    winners = [j for j, v in votes.items() if v == max_votes]
+    room = g.room
+    max_votes, winners = room.top_voted()
 
     return render_template(
         "admin_result.html",
-        votes=votes,
+        votes=room.votes,
         winners=winners,
         max_votes=max_votes,
-        roles=roles,
-        joueur_vote_pour=joueur_vote_pour
+        roles=room.roles,
+        joueur_vote_pour=room.joueur_vote_pour
     )
 
 
-@app.route("/admin", methods=["GET", "POST"])
+@app.route("/r/<room>/admin", methods=["GET", "POST"])
 def admin_login():
     if request.method == "POST":
         if request.form.get("password") == ADMIN_PASSWORD:
             session["is_admin"] = True
+            if g.room is None:
+                g.room = create_room(g.room_id, request.args.get("players", type=int))
             return redirect(url_for("admin_dashboard"))
         return render_template("admin_login.html", error=True)
     return render_template("admin_login.html", error=False)
 
 
-@app.route("/admin/logout")
+@app.route("/r/<room>/admin/logout")
 def admin_logout():
     session.pop("is_admin", None)
     return redirect(url_for("select_player"))
 
 
-@app.route("/admin/dashboard")
+@app.route("/r/<room>/admin/dashboard")
 @admin_required
 def admin_dashboard():
+    room = g.room
 
-    total_voters = len(joueurs_ayant_vote)
-    all_voted = (total_voters == len(joueurs))
+    total_voters = room.ledger.total_voters
+    all_voted = (total_voters == len(room.joueurs))
 
     # Pour surligner le/les joueurs les plus votés après Reveal
-    top_voted_players = []
-    max_votes_value = 0
-    if votes:
-        max_votes_value = max(votes.values())
-        top_voted_players = [j for j, v in votes.items() if v == max_votes_value]
+    max_votes_value, top_voted_players = room.top_voted()
+
+    # Grille et tableau (page courante) : re-rendus seulement quand rôles, éliminés,
+    # couple ou votes changent
+    joueurs, page, pages = player_page(room.joueurs, request.args.get("page", 1, type=int))
+    key = (room.roles_version, room.eliminated_version, room.couple_version, room.ledger.version)
+    parts = (joueurs, room.roles, room.votes, room.joueurs_ayant_vote,
+             room.eliminated_players, room.couple_players)
+    grid_html = render_fragment(room, f"admin_grid:{page}", key, "admin_grid", *parts)
+    rows_html = render_fragment(
+        room, f"admin_rows:{page}", key + (room.reveal_results,), "admin_rows",
+        *parts, room.reveal_results, top_voted_players, max_votes_value,
+    )
 
     return render_template(
         "admin_dashboard.html",
-        joueurs=joueurs,
-        votes=votes,
-        joueurs_ayant_vote=joueurs_ayant_vote,
-        admin_started=admin_started,
-        reveal_results=reveal_results,
+        joueurs=room.joueurs,
+        admin_started=room.admin_started,
+        reveal_results=room.reveal_results,
         all_voted=all_voted,
-        status=[(j, j in joueurs_ayant_vote) for j in joueurs],
-        eliminated_players=eliminated_players,
-        roles=roles,
-        couple_players=couple_players,
         total_voters=total_voters,
-        top_voted_players=top_voted_players,
-        max_votes=max_votes_value,
+        night_actions=len(room.night_actions),
+        grid_html=grid_html,
+        rows_html=rows_html,
+        page=page,
+        pages=pages,
     )
 
 
-@app.route("/admin/start")
+@app.route("/r/<room>/admin/start")
 @admin_required
 def admin_start():
-    global admin_started
-    admin_started = True
+    with mutate() as room:
+        room.start()
+        bump_state(room, "start")
     return redirect(url_for("admin_dashboard"))
 
 
-@app.route("/admin/reveal")
+@app.route("/r/<room>/admin/reveal")
 @admin_required
 def admin_reveal():
-    global reveal_results, eliminated_players
-
-    reveal_results = True
-
-    # Pas d'élimination si pas de votes ou que tout est à 0
-    if not votes:
-        return redirect(url_for("admin_dashboard"))
-
-    max_votes = max(votes.values())
-    if max_votes <= 0:
-        return redirect(url_for("admin_dashboard"))
-
-    top_voted = [j for j, v in votes.items() if v == max_votes]
-
-    # Égalité => on ne tue personne (à ajuster si tu veux une autre règle)
-    if len(top_voted) != 1:
-        return redirect(url_for("admin_dashboard"))
-
-    eliminated = top_voted[0]
-
-    # Déjà éliminé => rien
-    if eliminated in eliminated_players:
-        return redirect(url_for("admin_dashboard"))
-
-    # Élimination
-    eliminated_players.add(eliminated)
-
-    # Couple : si l'un meurt, l'autre aussi
-    if eliminated in couple_players:
-        for p in couple_players:
-            eliminated_players.add(p)
+    with mutate() as room:
+        room.reveal()
+        bump_state(room, "reveal")
 
     return redirect(url_for("admin_dashboard"))
 
 
 
-@app.route("/admin/next_night")
+@app.route("/r/<room>/admin/next_night")
 @admin_required
 def admin_next_night():
-    reset_round_keep_eliminated()
+    with mutate() as room:
+        archive_round(room)
+        room.reset_round_keep_eliminated()
+        bump_state(room, "next_night")
     return redirect(url_for("admin_dashboard"))
 
 
-@app.route("/admin/eliminate/<joueur>")
+@app.route("/r/<room>/admin/eliminate/<joueur>")
 @admin_required
 def admin_eliminate(joueur):
-    if joueur in joueurs:
-        eliminated_players.add(joueur)
+    with mutate() as room:
+        if joueur in room.joueurs:
+            room.eliminate(joueur)
+            bump_state(room, "eliminate", joueur=joueur)
     return redirect(url_for("admin_dashboard"))
 
-@app.route("/admin/resurrect/<joueur>")
+@app.route("/r/<room>/admin/resurrect/<joueur>")
 @admin_required
 def admin_resurrect(joueur):
-    if joueur in joueurs:
-        eliminated_players.discard(joueur)
+    with mutate() as room:
+        if joueur in room.joueurs:
+            room.resurrect(joueur)
+
+            # Optionnel : si tu veux aussi "réanimer" l'amoureux automatiquement
+            # (je te conseille de NE PAS le faire automatiquement)
+            # if joueur in room.couple_players:
+            #     for p in room.couple_players:
+            #         room.eliminated_players.discard(p)
 
-        # Optionnel : si tu veux aussi "réanimer" l'amoureux automatiquement
-        # (je te conseille de NE PAS le faire automatiquement)
-        # if joueur in couple_players:
-        #     for p in couple_players:
-        #         eliminated_players.discard(p)
+            bump_state(room, "resurrect", joueur=joueur)
 
     return redirect(url_for("admin_dashboard"))
 
@@ -699,22 +946,24 @@ def admin_resurrect(joueur):
 # ADMIN : CHOIX DU COUPLE
 # -----------------------------------------------------
 
-@app.route("/admin/couple", methods=["GET", "POST"])
+@app.route("/r/<room>/admin/couple", methods=["GET", "POST"])
 @admin_required
 def admin_couple():
-    global couple_players
+    room = g.room
 
     if request.method == "POST":
         selected = request.form.getlist("couple")
-        if len(selected) == 2 and all(j in joueurs for j in selected):
-            couple_players = set(selected)
+        with mutate() as room:
+            if len(selected) == 2 and all(j in room.joueurs for j in selected):
+                room.set_couple(selected)
+                bump_state(room, "couple", players=selected)
         return redirect(url_for("admin_dashboard"))
 
     return render_template(
         "admin_couple.html",
-        joueurs=joueurs,
-        couple_players=couple_players,
-        roles=roles
+        joueurs=room.joueurs,
+        couple_players=room.couple_players,
+        roles=room.roles
     )
 
 
@@ -722,33 +971,29 @@ def admin_couple():
 # ADMIN : VUE DES MESSAGES DES MORTS
 # -----------------------------------------------------
 
-@app.route("/admin/necro_chat")
+@app.route("/r/<room>/admin/necro_chat")
 @admin_required
 def admin_necro_chat():
-    necro_id = get_necromancer()
-
-    # dernier message par auteur (ou unique)
-    messages_by_author = {}
-    for m in necro_messages:
-        messages_by_author[m["author"]] = m
+    room = g.room
+    necro_id = room.get_necromancer()
 
     return render_template(
         "admin_necro_chat.html",
         necro_id=necro_id,
-        eliminated_players=eliminated_players,
-        messages_by_author=messages_by_author,
-        roles=roles,
+        eliminated_players=room.eliminated_players,
+        # message par auteur (un seul par joueur)
+        messages_by_author=room.last_wills,
+        roles=room.roles,
     )
 
 
-@app.route("/admin/necro_reveal/<int:msg_id>")
+@app.route("/r/<room>/admin/necro_reveal/<int:msg_id>")
 @admin_required
 def admin_necro_reveal(msg_id):
     """Marque un message comme révélé au Nécromancien."""
-    for m in necro_messages:
-        if m["id"] == msg_id:
-            m["revealed"] = True
-            break
+    with mutate() as room:
+        if room.reveal_last_will(msg_id):
+            bump_state(room, "necro_reveal", id=msg_id)
     return redirect(url_for("admin_necro_chat"))
 
 
@@ -756,10 +1001,10 @@ def admin_necro_reveal(msg_id):
 # ADMIN : ESPRIT FARCEUR (échange de rôles)
 # -----------------------------------------------------
 
-@app.route("/admin/esprit_farceur", methods=["GET", "POST"])
+@app.route("/r/<room>/admin/esprit_farceur", methods=["GET", "POST"])
 @admin_required
 def admin_esprit_farceur():
-    global roles
+    room = g.room
 
     message = None
     error = None
@@ -772,17 +1017,19 @@ def admin_esprit_farceur():
             error = "Vous devez choisir deux joueurs."
         elif j1 == j2:
             error = "Les deux joueurs doivent être différents."
-        elif j1 not in joueurs or j2 not in joueurs:
+        elif j1 not in room.joueurs or j2 not in room.joueurs:
             error = "Joueur inconnu."
         else:
             # échange des rôles
-            roles[j1], roles[j2] = roles[j2], roles[j1]
+            with mutate() as room:
+                room.swap_roles(j1, j2)
+                bump_state(room, "swap", j1=j1, j2=j2)
             message = f"Les rôles de Joueur {j1} et Joueur {j2} ont été échangés."
 
     return render_template(
         "admin_esprit_farceur.html",
-        joueurs=joueurs,
-        roles=roles,
+        joueurs=room.joueurs,
+        roles=room.roles,
         message=message,
         error=error,
     )
@@ -792,30 +1039,28 @@ def admin_esprit_farceur():
 # JOUEUR MORT : PAGE DE RÉDACTION DU MESSAGE
 # -----------------------------------------------------
 
-@app.route("/dead_message/<joueur>", methods=["GET", "POST"])
+@app.route("/r/<room>/dead_message/<joueur>", methods=["GET", "POST"])
 def dead_message(joueur):
-    global necro_messages, necro_next_id
+    room = g.room
 
-    if joueur not in joueurs:
+    if joueur not in room.joueurs:
         return "Joueur inconnu", 404
 
     # Doit être éliminé
-    if joueur not in eliminated_players:
+    if joueur not in room.eliminated_players:
         return redirect(url_for("vote_page", votant=joueur))
 
     # Un seul message par joueur
-    already_sent = any(m["author"] == joueur for m in necro_messages)
+    already_sent = room.player_has_last_will(joueur)
 
     if request.method == "POST" and not already_sent:
         text = request.form.get("message", "").strip()
         if text:
-            necro_messages.append({
-                "id": necro_next_id,
-                "author": joueur,
-                "text": text,
-                "revealed": False,
-            })
-            necro_next_id += 1
+            with mutate() as room:
+                # re-vérifié sous verrou : un seul message par joueur
+                if not room.player_has_last_will(joueur):
+                    room.add_last_will(joueur, text)
+                    bump_state(room, "last_will", joueur=joueur, text=text)
 
         return redirect(url_for("vote_page", votant=joueur))
 
@@ -825,36 +1070,56 @@ def dead_message(joueur):
         already_sent=already_sent,
     )
 
-@app.route("/admin/exorciste", methods=["GET", "POST"])
+@app.route("/r/<room>/admin/exorciste", methods=["GET", "POST"])
 @admin_required
 def admin_exorciste():
-    global exorcised_player
+    room = g.room
 
     if request.method == "POST":
         joueur = request.form.get("joueur")
-        if joueur in joueurs:
-            exorcised_player = joueur
+        with mutate() as room:
+            if joueur in room.joueurs:
+                room.exorcise(joueur)
+                bump_state(room, "exorcise", joueur=joueur)
         return redirect(url_for("admin_dashboard"))
 
     return render_template(
         "admin_exorciste.html",
-        joueurs=joueurs,
-        exorcised_player=exorcised_player,
-        eliminated_players=eliminated_players
+        joueurs=room.joueurs,
+        exorcised_player=room.exorcised_player,
+        eliminated_players=room.eliminated_players
     )
 
+# -----------------------------------------------------
+# ADMIN : STATISTIQUES DES PARTIES
+# -----------------------------------------------------
+
+@app.route("/r/<room>/admin/analytics")
+@admin_required
+def admin_analytics():
+    if history_db is None:
+        return "Statistiques désactivées (ANALYTICS_DB).", 404
+
+    t0 = time.perf_counter()
+    summaries = [("Cette table", history_db.summary(g.room_id)), ("Toutes les tables", history_db.summary())]
+    query_ms = (time.perf_counter() - t0) * 1000
+
+    return render_template("admin_analytics.html", summaries=summaries, query_ms=query_ms)
+
+
 # -----------------------------------------------------
 # NÉCROMANCIEN : VUE DES MESSAGES RÉVÉLÉS
 # -----------------------------------------------------
 
-@app.route("/necro_chat/<joueur>")
+@app.route("/r/<room>/necro_chat/<joueur>")
 def necro_chat(joueur):
-    necro_id = get_necromancer()
+    room = g.room
+    necro_id = room.get_necromancer()
 
     if necro_id is None or joueur != necro_id:
         return "Accès réservé au Nécromancien.", 403
 
-    visible_messages = [m for m in necro_messages if m["revealed"]]
+    visible_messages = [m for m in room.necro_messages if m.revealed]
 
     return render_template(
         "necro_chat.html",
@@ -862,7 +1127,66 @@ def necro_chat(joueur):
         messages=visible_messages,
     )
 
-@app.route("/spectator")
+# -----------------------------------------------------
+# SOCKET.IO
+# -----------------------------------------------------
+
+@socketio.on("connect")
+def socket_connect():
+    room = rooms.get(request.args.get("room", ""))
+    if room is None:
+        return False
+
+    join_room(room.room_id)
+    SOCKET_CLIENTS.inc()
+    # état initial : le client n'a rien raté entre son dernier poll et la connexion
+    emit("state", public_state(room))
+
+
+@socketio.on("disconnect")
+def socket_disconnect(*args):
+    SOCKET_CLIENTS.dec()
+
+
+# -----------------------------------------------------
+# SPECTATEUR
+# -----------------------------------------------------
+
+def spectator_view(room, page=None):
+    """Vue spectateur (rôles compris) ; page=N : seulement les joueurs de cette page."""
+    total_voters = room.ledger.total_voters
+    all_voted = (total_voters == len(room.joueurs))
+
+    max_votes_value, top_voted_players = room.top_voted()
+    joueurs, page_, pages = player_page(room.joueurs, page)
+    paged = page is not None
+
+    # On renvoie tout ce que le spectateur doit voir (y compris les rôles)
+    return {
+        "joueurs": joueurs,
+        "player_count": len(room.joueurs),
+        "page": page_,
+        "pages": pages,
+        # { "1": {"name":..., "icon_list":...}, ... }
+        "roles": {j: {"name": room.roles[j]["name"], "icon_list": room.roles[j]["icon_list"]} for j in joueurs},
+        "votes": {j: room.votes[j] for j in joueurs},
+        "joueurs_ayant_vote": page_members(room.joueurs_ayant_vote, joueurs, paged),
+        "joueur_vote_pour": {j: c for j, c in room.joueur_vote_pour.items() if not paged or j in joueurs},
+        "admin_started": room.admin_started,
+        "reveal_results": room.reveal_results,
+        "eliminated_players": page_members(room.eliminated_players, joueurs, paged),
+        "couple_players": list(room.couple_players),
+        "total_voters": total_voters,
+        "all_voted": all_voted,
+        "max_votes": max_votes_value,
+        "top_voted_players": top_voted_players,
+
+        # Optionnel: si tu veux aussi afficher les messages nécro côté spectateur
+        "necro_messages": [m.to_dict() for m in room.necro_messages],
+    }
+
+
+@app.route("/r/<room>/spectator")
 def spectator():
     # Optionnel: sécuriser l’accès via ?key=...
     if SPECTATOR_KEY:
@@ -871,34 +1195,300 @@ def spectator():
 
     return render_template("spectator_dashboard.html", spectator_key=SPECTATOR_KEY)
 
-@app.route("/api/admin_state")
-@admin_required
-def api_admin_state():
-    total_voters = len(joueurs_ayant_vote)
-    all_voted = (total_voters == len(joueurs))
 
-    max_votes_value = max(votes.values()) if votes else 0
-    top_voted_players = [j for j, v in votes.items() if v == max_votes_value] if max_votes_value > 0 else []
+@app.route("/r/<room>/api/spectator_state")
+def api_spectator_state():
+    # Optionnel: sécuriser l’accès via ?key=...
+    if SPECTATOR_KEY:
+        if request.args.get("key") != SPECTATOR_KEY:
+            abort(403)
 
-    return jsonify({
-        "votes": votes,  # { "1": 0, ... }
-        "joueurs_ayant_vote": list(joueurs_ayant_vote),
+    # ?page=N : seulement les joueurs de cette page (grandes tables)
+    page = request.args.get("page", type=int)
+    return versioned_json("spectator", lambda room: spectator_view(room, page), arg=page)
+
+
+def encode_spectator(room_id: str, page, base=None):
+    """
+    (version, événement, octets JSON) pour le flux : vue spectateur complète
+    ("state", les mêmes octets que /api/spectator_state) ou patch depuis `base` ("patch").
+    """
+    room = rooms.get(room_id)
+    snap, is_patch = view_snapshot(
+        room, "spectator", page, lambda r: spectator_view(r, page), base, "api_spectator_stream",
+    )
+    return room.version, "patch" if is_patch else "state", snap.body
+
+
+# Flux SSE du dashboard spectateur : un producteur par table, une file bornée par abonné
+spectator_streams = StreamHub(
+    socketio, lambda room_id: rooms.version(room_id), encode_spectator,
+    poll=LONG_POLL_STEP, heartbeat=float(os.environ.get("SSE_HEARTBEAT", 15)),
+)
+
+
+@app.route("/r/<room>/api/spectator_stream")
+def api_spectator_stream():
+    """Vue spectateur en Server-Sent Events, poussée à chaque changement (?page=N possible)."""
+    if SPECTATOR_KEY:
+        if request.args.get("key") != SPECTATOR_KEY:
+            abort(403)
+
+    page = request.args.get("page", type=int)
+    response = app.response_class(spectator_streams.subscribe(g.room_id, page), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # pas de mise en tampon par nginx
+    return response
+
+
+def admin_view(room, page=None):
+    """Vue du dashboard admin ; page=N : seulement les joueurs de cette page."""
+    total_voters = room.ledger.total_voters
+    all_voted = (total_voters == len(room.joueurs))
+
+    max_votes_value, top_voted_players = room.top_voted()
+    joueurs, _, _ = player_page(room.joueurs, page)
+    paged = page is not None
+
+    return {
+        "votes": {j: room.votes[j] for j in joueurs},  # { "1": 0, ... }
+        "joueurs_ayant_vote": page_members(room.joueurs_ayant_vote, joueurs, paged),
         "total_voters": total_voters,
         "all_voted": all_voted,
-        "admin_started": admin_started,
-        "reveal_results": reveal_results,
-        "eliminated_players": list(eliminated_players),
+        "admin_started": room.admin_started,
+        "reveal_results": room.reveal_results,
+        "eliminated_players": page_members(room.eliminated_players, joueurs, paged),
         "top_voted_players": top_voted_players,
         "max_votes": max_votes_value,
-    })
+        "night_actions": len(room.night_actions),  # actions de nuit en attente du Start
+    }
 
 
+@app.route("/r/<room>/api/admin_state")
+@admin_required
+def api_admin_state():
+    # ?page=N : seulement les joueurs de la page affichée du dashboard
+    page = request.args.get("page", type=int)
+    return versioned_json("admin", lambda room: admin_view(room, page), arg=page)
+
+
+# -----------------------------------------------------
+# ADMIN : COMMANDES GROUPÉES
+# -----------------------------------------------------
+
+# op -> champs désignant des joueurs ("players" : une liste)
+ADMIN_COMMANDS = {
+    "start": (),
+    "reveal": (),
+    "next_night": (),
+    "reset": (),
+    "eliminate": ("joueur",),
+    "resurrect": ("joueur",),
+    "exorcise": ("joueur",),
+    "couple": ("players",),
+    "swap": ("j1", "j2"),
+}
+
+
+def parse_command(room, cmd) -> dict:
+    """Commande {"op": ..., <champs>} vérifiée -> {"type": op, <champs>} ; ValueError sinon."""
+    if not isinstance(cmd, dict) or cmd.get("op") not in ADMIN_COMMANDS:
+        raise ValueError("opération inconnue")
+
+    op = cmd["op"]
+    event = {"type": op}
+    for field in ADMIN_COMMANDS[op]:
+        value = cmd.get(field)
+        players = value if field == "players" else [value]
+        if not isinstance(players, list) or not all(str(j) in room.joueurs for j in players):
+            raise ValueError(f"{field} : joueur inconnu")
+        event[field] = [str(j) for j in players] if field == "players" else str(value)
+
+    if op == "couple" and len(set(event["players"])) != 2:
+        raise ValueError("le couple demande deux joueurs différents")
+    if op == "swap" and event["j1"] == event["j2"]:
+        raise ValueError("les deux joueurs doivent être différents")
+    return event
+
+
+def run_command(room, event: dict) -> dict:
+    """Applique une commande vérifiée (dans mutate()) ; renvoie son événement pour le journal."""
+    op = event["type"]
+    if op == "start":
+        room.start()
+    elif op == "reveal":
+        room.reveal()
+    elif op == "next_night":
+        archive_round(room)
+        room.reset_round_keep_eliminated()
+    elif op == "reset":
+        archive_round(room, game_over=True)
+        room.reset_all()
+        event = {"type": op, "roles": room.role_indexes()}
+    elif op == "eliminate":
+        room.eliminate(event["joueur"])
+    elif op == "resurrect":
+        room.resurrect(event["joueur"])
+    elif op == "exorcise":
+        room.exorcise(event["joueur"])
+    elif op == "couple":
+        room.set_couple(event["players"])
+    elif op == "swap":
+        room.swap_roles(event["j1"], event["j2"])
+    return event
+
+
+@app.route("/r/<room>/api/admin/commands", methods=["POST"])
+@admin_required
+def api_admin_commands():
+    """
+    Liste ordonnée de commandes appliquée d'un bloc, sous une seule version :
+        {"commands": [{"op": "eliminate", "joueur": "3"}, {"op": "next_night"}]}
+    Tout est vérifié avant d'appliquer quoi que ce soit (400 sinon, rien ne
+    change). Réponse : la vue admin (?page=N), ou un patch avec ?from=<version>.
+    """
+    # JSON seulement : un formulaire d'un autre site ne peut pas déclencher de commande
+    body = request.get_json(silent=True) if request.is_json else None
+    commands = body.get("commands") if isinstance(body, dict) else None
+    if not isinstance(commands, list) or not commands:
+        return jsonify({"error": "commands : liste de commandes attendue"}), 400
+
+    with mutate() as room:
+        parsed = []
+        for i, cmd in enumerate(commands):
+            try:
+                parsed.append(parse_command(room, cmd))
+            except ValueError as exc:
+                return jsonify({"error": str(exc), "index": i}), 400
+
+        bump_state(room, "batch", events=[run_command(room, event) for event in parsed])
+
+    page = request.args.get("page", type=int)
+    snap, _ = view_snapshot(
+        room, "admin", page, lambda r: admin_view(r, page), request.args.get("from", type=int), request.endpoint,
+    )
+    return app.response_class(snap.body, mimetype="application/json")
+
 
 # -----------------------------------------------------
 # DÉMARRAGE
 # -----------------------------------------------------
 
-assign_random_roles()
+def write_checkpoint():
+    checkpoint.save(rooms, CHECKPOINT_PATH, events.position() if events else 0)
+
+
+# Arrêt en cours : plus de connexions retenues, plus de keep-alive
+draining = False
+
+
+def drain():
+    """
+    Relâche les connexions retenues (long-polls, flux SSE, sockets) pour que le
+    worker s'arrête sans attendre graceful_timeout ; les clients se reconnectent
+    au worker suivant.
+    """
+    global draining
+    draining = True
+    spectator_streams.close()
+    # pas de blocage dans le gestionnaire de signal (gevent / eventlet)
+    socketio.start_background_task(socketio.server.eio.disconnect)
+
+
+@app.after_request
+def close_when_draining(response):
+    if draining:
+        response.headers["Connection"] = "close"
+    return response
+
+
+def restore_rooms():
+    """Tables du dernier checkpoint (+ fin du journal), sinon du journal seul."""
+    restored = checkpoint.load(CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+    if restored is not None:
+        loaded, log_offset = restored
+        if events:
+            eventlog.replay(EVENT_LOG, loaded, log_offset)
+        for room in loaded.values():
+            rooms.put(room)
+    elif events:
+        eventlog.restore(rooms, EVENT_LOG)
+
+
+def warm_templates():
+    """Compile tous les templates (relus du cache de bytecode s'il est à jour)."""
+    env = app.jinja_env
+    for name in env.list_templates(extensions=("html",)):
+        env.get_template(name)
+
+
+_started = False
+
+
+def create_app(warm: bool = True):
+    """
+    Application prête à servir, une fois par processus (worker) : Socket.IO,
+    stockage des tables, journal, statistiques et cache d'images ouverts,
+    tables restaurées, arrêt propre sur SIGTERM, templates compilés avant la
+    première requête (sauf warm=False). Rien de tout cela à l'import, qui n'a
+    aucun effet sur le disque ; les tables elles-mêmes sont créées à leur
+    première visite.
+
+        python serve.py    (ou gunicorn "app:create_app()")
+    """
+    global _started, rooms, events, history_db, images
+    if _started:
+        return app
+    _started = True
+
+    socketio.init_app(
+        app,
+        async_mode=os.environ.get("SOCKETIO_ASYNC_MODE") or None,
+        message_queue=os.environ.get("SOCKETIO_MESSAGE_QUEUE") or None,
+    )
+    rooms = open_store()
+    if EVENT_LOG:
+        events = eventlog.EventLog(
+            EVENT_LOG,
+            fsync_interval=float(os.environ.get("EVENT_LOG_FSYNC_INTERVAL", 0.2)),
+            snapshot_every=int(os.environ.get("EVENT_LOG_SNAPSHOT_EVERY", 5000)),
+        )
+    if ANALYTICS_DB:
+        history_db = analytics.AnalyticsStore(ANALYTICS_DB)
+    images = ImageDerivatives(
+        static_dir=app.static_folder,
+        cache_dir=IMAGE_CACHE_DIR,
+        sources=[r[k] for r in base_roles for k in ("icon", "icon_list")] + ["role_cache2.png", "fond.png"],
+        max_bytes=int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 200 * 1024 * 1024)),
+    )
+
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    if warm:
+        warm_templates()
+
+    # Les autres backends conservent déjà l'état hors du processus
+    if isinstance(rooms, MemoryStore):
+        restore_rooms()
+        for room_id in rooms.room_ids():
+            for kind, n in pending_counts(rooms.get(room_id)).items():
+                MESSAGES_PENDING.inc(kind, amount=n)
+        if CHECKPOINT_PATH:
+            checkpoint.on_sigterm(write_checkpoint)
+
+    checkpoint.on_sigterm(drain)
+    return app
+
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0")
+    # serveur de développement, local par défaut (DEV_HOST) ; en production : python serve.py.
+    # Jamais de reloader : son processus surveillant ferait create_app() et consommerait
+    # le checkpoint avant le processus qui sert. Débogueur seulement avec FLASK_DEBUG=1.
+    socketio.run(
+        create_app(),
+        host=os.environ.get("DEV_HOST", "127.0.0.1"),
+        debug=os.environ.get("FLASK_DEBUG") == "1",
+        use_reloader=False,
+        allow_unsafe_werkzeug=True,
+    )
@@ -0,0 +1,449 @@
+"""
+Banc de charge : des tables complètes de joueurs qui pollent, en local, sans réseau.
+
+L'application est lancée sous chaque serveur demandé (Werkzeug, gunicorn sync,
+gunicorn gevent, gunicorn eventlet) sur un port local, puis des clients simulés
+reproduisent le comportement des templates en mode polling (socket indisponible) :
+
+- joueur avant le début (welcome.html) : /api/spectator_state et /api/messages
+  toutes les 1500 ms
+- joueur en partie (index.html, waiting.html...) : /api/status toutes les
+  1500 ms (pollStatus), vote /vote/<votant>/<cible> quelques secondes après
+  le start, rechargement de la page à chaque changement de phase
+- spectateur : /api/spectator_state toutes les 700 ms (tick)
+- admin : /api/admin_state toutes les 1200 ms, start / reveal / next_night
+  (suivis du rechargement du dashboard), reset quand il reste trop peu de vivants
+
+Comme un navigateur, chaque client renvoie l'ETag reçu (If-None-Match) et
+garde sa connexion ouverte. Le résultat (p50/p95/p99 et débit par route et par
+serveur) est affiché et écrit en JSON pour suivre les régressions :
+
+    python bench/loadtest.py --servers werkzeug,gunicorn-sync --tables 20 --duration 30
+    python bench/loadtest.py --compare bench/results/loadtest-20260101-120000.json
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+ADMIN_PASSWORD = "bench"
+
+# Intervalles des templates (secondes)
+STATUS_INTERVAL = 1.5       # liveState(..., 1500) des pages joueurs
+WELCOME_INTERVAL = 1.5      # welcome.html : état spectateur + messages
+SPECTATOR_INTERVAL = 0.7    # spectator_dashboard.html : setInterval(tick, 700)
+ADMIN_INTERVAL = 1.2        # admin_dashboard.html : pollAdmin
+
+# Rythme de jeu simulé (secondes)
+VOTE_DELAY = (1.0, 8.0)     # temps de réflexion avant de voter
+ROUND_TIMEOUT = 20.0        # reveal même si tout le monde n'a pas voté
+RESULT_PAUSE = 4.0          # résultats affichés avant la nuit suivante
+NIGHT_PAUSE = 3.0           # nuit avant le start suivant
+MIN_ALIVE = 4               # en dessous : nouvelle partie (reset)
+
+WERKZEUG_RUN = (
+    "import sys; from werkzeug.serving import run_simple; from app import create_app; "
+    "run_simple('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True)"
+)
+
+
+def server_command(name: str, port: int, sync_workers: int):
+    """(commande, variables d'environnement) pour lancer l'application."""
+    bind = f"127.0.0.1:{port}"
+    gunicorn = [sys.executable, "-m", "gunicorn", "-b", bind, "--log-level", "warning"]
+
+    if name == "werkzeug":
+        return [sys.executable, "-c", WERKZEUG_RUN, str(port)], {"SOCKETIO_ASYNC_MODE": "threading"}
+    if name == "gunicorn-sync":
+        # plusieurs workers : l'état doit être partagé (SQLite)
+        return gunicorn + ["-w", str(sync_workers), "app:create_app()"], {
+            "SOCKETIO_ASYNC_MODE": "threading",
+            "STATE_BACKEND": "sqlite",
+        }
+    if name == "gevent":
+        return gunicorn + ["-k", "gevent", "-w", "1", "app:create_app()"], {"SOCKETIO_ASYNC_MODE": "gevent"}
+    if name == "eventlet":
+        return gunicorn + ["-k", "eventlet", "-w", "1", "app:create_app()"], {"SOCKETIO_ASYNC_MODE": "eventlet"}
+
+    raise ValueError(f"Serveur inconnu : {name!r}")
+
+
+SERVERS = ("werkzeug", "gunicorn-sync", "gevent", "eventlet")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(name: str, sync_workers: int, workdir: str):
+    port = free_port()
+    cmd, env = server_command(name, port, sync_workers)
+    env = {
+        **os.environ,
+        **env,
+        "PYTHONPATH": ROOT,
+        "ADMIN_PASSWORD": ADMIN_PASSWORD,
+        "SECRET_KEY": "bench",
+        "EVENT_LOG": os.path.join(workdir, "events.log"),
+        "CHECKPOINT_PATH": "",
+        "STATE_SQLITE_PATH": os.path.join(workdir, "state.db"),
+        "IMAGE_CACHE_DIR": os.path.join(workdir, "img_cache"),
+    }
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} s'est arrêté : {proc.stderr.read().decode()[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+
+    proc.kill()
+    raise RuntimeError(f"{name} ne répond pas sur le port {port}")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# -----------------------------------------------------
+# CLIENTS SIMULÉS
+# -----------------------------------------------------
+
+class Client:
+    """Un onglet de navigateur : connexion persistante, cookie de session, cache ETag."""
+
+    def __init__(self, port: int, stop: threading.Event):
+        self.port = port
+        self.stop = stop
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.cookie = None
+        self.cache = {}                    # chemin -> (etag, corps)
+        self.samples = defaultdict(list)   # route -> latences (s)
+        self.errors = Counter()
+
+    def request(self, route: str, path: str, method: str = "GET", form: dict = None):
+        """(statut, corps) ; (None, None) en cas d'erreur réseau."""
+        headers = {}
+        body = None
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        cached = self.cache.get(path) if method == "GET" else None
+        if cached:
+            headers["If-None-Match"] = cached[0]
+        if form is not None:
+            body = urllib.parse.urlencode(form, doseq=True)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        t0 = time.perf_counter()
+        try:
+            self.conn.request(method, path, body, headers)
+            resp = self.conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.errors[route] += 1
+            return None, None
+        self.samples[route].append(time.perf_counter() - t0)
+
+        if resp.status >= 500:
+            self.errors[route] += 1
+        cookie = resp.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        if resp.status == 304 and cached:
+            return 200, cached[1]
+        etag = resp.getheader("ETag")
+        if etag:
+            self.cache[path] = (etag, data)
+        return resp.status, data
+
+    def json(self, route: str, path: str):
+        status, data = self.request(route, path)
+        if status != 200:
+            return None
+        return json.loads(data)
+
+    def sleep_until(self, t: float):
+        self.stop.wait(max(0.0, t - time.monotonic()))
+
+
+def run_player(client: Client, room: str, votant: str):
+    base = f"/r/{room}"
+    client.request("page_vote", f"{base}/vote/{votant}")
+    next_tick = time.monotonic() + random.uniform(0, STATUS_INTERVAL)
+    phase = None
+    vote_at = None
+
+    while not client.stop.is_set():
+        client.sleep_until(next_tick)
+        if client.stop.is_set():
+            break
+
+        status = client.json("api_status", f"{base}/api/status?votant={votant}")
+        if status is None:
+            next_tick = time.monotonic() + STATUS_INTERVAL
+            continue
+
+        # changement de phase : la page se recharge (handle() des templates)
+        current = (status["admin_started"], status["reveal"], status["eliminated"])
+        if current != phase:
+            if phase is not None:
+                client.request("page_vote", f"{base}/vote/{votant}")
+            phase = current
+            started, reveal, eliminated = current
+            vote_at = time.monotonic() + random.uniform(*VOTE_DELAY) if started and not reveal and not eliminated else None
+
+        if not status["admin_started"]:
+            # welcome.html : bandeau des rôles + messagerie
+            client.request("api_spectator_state", f"{base}/api/spectator_state")
+            client.request("api_messages", f"{base}/api/messages/{votant}")
+        elif vote_at is not None and time.monotonic() >= vote_at:
+            vote_at = None
+            state = client.json("api_spectator_state", f"{base}/api/spectator_state")
+            if state:
+                dead = set(map(str, state.get("eliminated_players", [])))
+                targets = [j for j in state.get("joueurs", []) if j != votant and j not in dead]
+                if targets:
+                    client.request("vote", f"{base}/vote/{votant}/{random.choice(targets)}")
+
+        next_tick += WELCOME_INTERVAL if not status["admin_started"] else STATUS_INTERVAL
+
+
+def run_spectator(client: Client, room: str):
+    path = f"/r/{room}/api/spectator_state"
+    client.request("page_spectator", f"/r/{room}/spectator")
+    next_tick = time.monotonic() + random.uniform(0, SPECTATOR_INTERVAL)
+    while not client.stop.is_set():
+        client.sleep_until(next_tick)
+        client.request("api_spectator_state", path)
+        next_tick += SPECTATOR_INTERVAL
+
+
+def run_admin(client: Client, room: str, players: int):
+    base = f"/r/{room}"
+
+    def action(route, path):
+        # les actions admin redirigent vers le dashboard, rechargé par le navigateur
+        client.request(route, path)
+        client.request("page_admin_dashboard", f"{base}/admin/dashboard")
+
+    action("admin_start", f"{base}/admin/start")
+    phase, phase_since = "vote", time.monotonic()
+    next_tick = time.monotonic()
+
+    while not client.stop.is_set():
+        client.sleep_until(next_tick)
+        next_tick += ADMIN_INTERVAL
+        state = client.json("api_admin_state", f"{base}/api/admin_state")
+        if state is None:
+            continue
+
+        now = time.monotonic()
+        alive = players - len(state["eliminated_players"])
+        voters = len(state["joueurs_ayant_vote"])
+
+        if phase == "vote" and (voters >= alive or now - phase_since > ROUND_TIMEOUT):
+            action("admin_reveal", f"{base}/admin/reveal")
+            phase, phase_since = "result", now
+        elif phase == "result" and now - phase_since > RESULT_PAUSE:
+            if alive - 1 < MIN_ALIVE:
+                action("reset", f"{base}/reset")
+            else:
+                action("admin_next_night", f"{base}/admin/next_night")
+            phase, phase_since = "night", now
+        elif phase == "night" and now - phase_since > NIGHT_PAUSE:
+            action("admin_start", f"{base}/admin/start")
+            phase, phase_since = "vote", now
+
+
+def run_table(port: int, room: str, stop: threading.Event, clients: list, threads: list):
+    admin = Client(port, stop)
+    admin.request("admin_login", f"/r/{room}/admin", "POST", {"password": ADMIN_PASSWORD})
+    clients.append(admin)
+
+    # la table existe (créée par l'admin) : joueurs et spectateur peuvent arriver
+    joueurs = (admin.json("api_spectator_state", f"/r/{room}/api/spectator_state") or {}).get("joueurs", [])
+    for votant in joueurs:
+        c = Client(port, stop)
+        clients.append(c)
+        threads.append(threading.Thread(target=run_player, args=(c, room, votant), daemon=True))
+    spectator = Client(port, stop)
+    clients.append(spectator)
+    threads.append(threading.Thread(target=run_spectator, args=(spectator, room), daemon=True))
+    threads.append(threading.Thread(target=run_admin, args=(admin, room, len(joueurs)), daemon=True))
+
+
+# -----------------------------------------------------
+# MESURE
+# -----------------------------------------------------
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p * len(sorted_values)) - 1)]
+
+
+def summarize(clients, duration: float) -> dict:
+    samples = defaultdict(list)
+    errors = Counter()
+    for c in clients:
+        for route, values in c.samples.items():
+            samples[route].extend(values)
+        errors.update(c.errors)
+
+    routes = {}
+    for route in sorted(set(samples) | set(errors)):
+        values = sorted(samples[route])
+        routes[route] = {
+            "count": len(values),
+            "errors": errors[route],
+            "rps": round(len(values) / duration, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
+
+    everything = sorted(v for values in samples.values() for v in values)
+    return {
+        "duration_s": round(duration, 2),
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "rps": round(len(everything) / duration, 2),
+        "p50_ms": round(percentile(everything, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(everything, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(everything, 0.99) * 1000, 2),
+        "routes": routes,
+    }
+
+
+def run_server(name: str, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"mgpr-bench-{name}-")
+    proc, port = start_server(name, args.sync_workers, workdir)
+    stop = threading.Event()
+    clients, threads = [], []
+    try:
+        for i in range(args.tables):
+            run_table(port, f"bench{i}", stop, clients, threads)
+        for c in clients:
+            # les requêtes de mise en place ne comptent pas
+            c.samples.clear()
+            c.errors.clear()
+
+        t0 = time.monotonic()
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join(10)
+        return summarize(clients, time.monotonic() - t0)
+    finally:
+        stop_server(proc)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_results(name: str, result: dict, baseline: dict = None):
+    print(f"\n== {name} : {result['requests']} requêtes, {result['rps']} req/s, "
+          f"{result['errors']} erreurs, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms")
+    print(f"   {'route':<22}{'req':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}")
+    for route, r in result["routes"].items():
+        line = (f"   {route:<22}{r['count']:>7}{r['rps']:>9}{r['p50_ms']:>9}"
+                f"{r['p95_ms']:>9}{r['p99_ms']:>9}{r['errors']:>6}")
+        before = (baseline or {}).get("routes", {}).get(route)
+        if before and before["p95_ms"]:
+            delta = (r["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            line += f"   p95 {delta:+.0f}%"
+        print(line)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge MGPR (tables simulées en polling)")
+    parser.add_argument("--servers", default=",".join(SERVERS),
+                        help=f"liste séparée par des virgules parmi {', '.join(SERVERS)}")
+    parser.add_argument("--tables", type=int, default=10, help="tables simulées (12 joueurs + spectateur + admin)")
+    parser.add_argument("--duration", type=float, default=30, help="durée de mesure par serveur (s)")
+    parser.add_argument("--sync-workers", type=int, default=4, help="workers gunicorn sync")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", help="fichier JSON de résultats (défaut : bench/results/loadtest-<date>.json)")
+    parser.add_argument("--compare", help="résultats JSON précédents : affiche l'évolution du p95 par route")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["servers"]
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "tables": args.tables,
+            "duration_s": args.duration,
+            "sync_workers": args.sync_workers,
+            "seed": args.seed,
+        },
+        "servers": {},
+    }
+
+    for name in args.servers.split(","):
+        name = name.strip()
+        try:
+            result = run_server(name, args)
+        except RuntimeError as e:
+            print(f"\n== {name} : ignoré ({e})")
+            report["servers"][name] = {"error": str(e)}
+            continue
+        report["servers"][name] = result
+        print_results(name, result, (baseline or {}).get(name))
+
+    out = args.out or os.path.join(RESULTS_DIR, f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nRésultats : {out}")
+
+
+if __name__ == "__main__":
+    main()
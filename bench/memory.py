@@ -0,0 +1,167 @@
+"""
+Banc mémoire : empreinte d'une table (GameRoom) quand un worker en tient des milliers.
+
+Chaque scénario crée --rooms tables de --players joueurs dans un processus neuf
+et mesure ce qu'elles coûtent, tout compris (rôles, votes, ensembles de
+joueurs, messages) :
+
+- idle  : tables créées, rôles distribués, personne n'a voté
+- vote  : vote ouvert, les trois quarts des joueurs ont voté
+- night : une nuit résolue (actions de nuit, morts, couple), puis un vote
+          dépouillé, des dernières volontés et des messages du maître du jeu
+
+Deux mesures : les octets alloués par table (tracemalloc, exact, hors
+interpréteur) et l'augmentation du RSS du processus (ce que voit le système).
+Les médianes sont affichées et écrites en JSON :
+
+    python bench/memory.py --rooms 10000
+    python bench/memory.py --rooms 10000 --players 12 30
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+# Exécuté dans le processus mesuré : python -c CHILD <scénario> <tables> <joueurs>
+CHILD = r"""
+import gc, json, random, sys, tracemalloc
+from game import GameRoom, player_ids
+
+scenario, n_rooms, n_players = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+joueurs = player_ids(n_players)
+rng = random.Random(0)
+
+
+def rss_kb():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def play(room):
+    if scenario == "night":
+        for j in room.joueurs:
+            kind = room.night_kind(j)
+            others = [p for p in room.joueurs if p != j]
+            if kind == "couple":
+                action = {"kind": kind, "targets": rng.sample(others, 2)}
+            elif kind == "relic":
+                action = {"kind": kind, "target": rng.choice(others), "relic": rng.choice(("vie", "mort"))}
+            elif kind is not None:
+                action = {"kind": kind, "target": rng.choice(others)}
+            else:
+                continue
+            if room.check_night_action(j, action) is None:
+                room.set_night_action(j, action)
+    if scenario in ("vote", "night"):
+        room.start()
+        alive = [j for j in room.joueurs if j not in room.eliminated_players]
+        for j in alive[: len(alive) * 3 // 4]:
+            room.cast_vote(j, rng.choice(alive))
+    if scenario == "night":
+        room.reveal()
+        for j in sorted(room.eliminated_players):
+            room.add_last_will(j, f"Dernière volonté du joueur {j}.")
+        room.reveal_last_will(1)
+        room.push_admin_message("demons", room.get_players_by_role("Démon"), "Choisissez votre victime.")
+        room.mark_messages_read(room.joueurs[0])
+
+
+def build(prefix):
+    rooms = {}
+    for i in range(n_rooms):
+        room_id = f"{prefix}{i}"
+        room = rooms[room_id] = GameRoom(room_id, joueurs)
+        play(room)
+    return rooms
+
+
+# RSS : premier lot, sans tracemalloc (qui alloue ses propres traces)
+gc.collect()
+rss0 = rss_kb()
+untraced = build("r")
+gc.collect()
+rss1 = rss_kb()
+
+# octets alloués : second lot, sous tracemalloc
+tracemalloc.start()
+before = tracemalloc.take_snapshot()
+traced = build("t")
+gc.collect()
+after = tracemalloc.take_snapshot()
+allocated = sum(s.size_diff for s in after.compare_to(before, "filename"))
+tracemalloc.stop()
+
+print(json.dumps({
+    "bytes_per_room": allocated / n_rooms,
+    "rss_per_room": (rss1 - rss0) * 1024 / n_rooms,
+    "total_mb": allocated / 2**20,
+}))
+"""
+
+SCENARIOS = ("idle", "vote", "night")
+
+
+def run_child(scenario: str, rooms: int, players: int) -> dict:
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    out = subprocess.run([sys.executable, "-c", CHILD, scenario, str(rooms), str(players)],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def medians(samples) -> dict:
+    return {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc mémoire MGPR (octets par table)")
+    parser.add_argument("--rooms", type=int, default=10_000, help="tables créées par essai")
+    parser.add_argument("--players", type=int, nargs="*", default=[12], help="joueurs par table")
+    parser.add_argument("--runs", type=int, default=3, help="essais par scénario (médiane)")
+    parser.add_argument("--out", help="fichier JSON de résultats (défaut : bench/results/memory-<date>.json)")
+    args = parser.parse_args()
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "rooms": args.rooms,
+        "runs": args.runs,
+        "scenarios": {},
+    }
+
+    print(f"{'scénario':<18}{'octets/table':>14}{'RSS/table':>12}{'total (Mo)':>12}   (médianes)")
+    for players in args.players:
+        for scenario in SCENARIOS:
+            name = f"{scenario}-{players}"
+            m = medians([run_child(scenario, args.rooms, players) for _ in range(args.runs)])
+            report["scenarios"][name] = m
+            print(f"{name:<18}{m['bytes_per_room']:>14.0f}{m['rss_per_room']:>12.0f}{m['total_mb']:>12.1f}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"memory-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nRésultats : {out}")
+
+
+if __name__ == "__main__":
+    main()
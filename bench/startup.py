@@ -0,0 +1,189 @@
+"""
+Banc de démarrage : du lancement d'un processus neuf à sa première réponse.
+
+Chaque essai démarre un interpréteur, importe app.py, appelle create_app() puis
+sert les premières pages de chaque sorte (sélection du joueur, vote, rôle,
+dashboard admin, spectateur) avec le client de test Flask, sans réseau :
+
+- lazy : create_app(warm=False), chaque template est compilé à sa première requête
+- cold : create_app() avec un cache de bytecode Jinja vide (premier worker)
+- warm : create_app() avec le cache écrit par l'essai précédent (workers suivants,
+  redémarrages)
+
+--serve mesure aussi le vrai lancement (python serve.py, worker sync) jusqu'à la
+première réponse HTTP 200, cache vide puis rempli. Les médianes sont affichées
+et écrites en JSON :
+
+    python bench/startup.py --runs 7
+    python bench/startup.py --serve
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+# Exécuté dans le processus mesuré ; BENCH_T0 : heure du lancement (time.time() du parent)
+CHILD = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+import app as A
+t1 = time.perf_counter()
+flask_app = A.create_app(warm=sys.argv[1] != "lazy")
+t2 = time.perf_counter()
+
+client = flask_app.test_client()
+first = client.get("/r/main/")
+assert first.status_code == 200, first.status_code
+t3 = time.perf_counter()
+since_spawn = time.time() - float(os.environ["BENCH_T0"])
+
+with client.session_transaction() as s:
+    s["is_admin"] = True
+for path in ("/r/main/vote/1", "/r/main/role/1", "/r/main/admin/dashboard", "/r/main/spectator"):
+    r = client.get(path)
+    assert r.status_code == 200, (path, r.status_code)
+t4 = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "first_response_ms": (t3 - t2) * 1000,
+    "other_pages_ms": (t4 - t3) * 1000,
+    "spawn_to_first_response_ms": since_spawn * 1000,
+}))
+"""
+
+SCENARIOS = ("lazy", "cold", "warm")
+
+
+def bench_env(workdir: str, template_cache: str) -> dict:
+    return {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "SOCKETIO_ASYNC_MODE": "threading",
+        "EVENT_LOG": "",
+        "CHECKPOINT_PATH": "",
+        "ANALYTICS_DB": "",
+        "IMAGE_CACHE_DIR": os.path.join(workdir, "img_cache"),
+        "TEMPLATE_CACHE_DIR": template_cache,
+    }
+
+
+def run_child(scenario: str, workdir: str) -> dict:
+    cache = os.path.join(workdir, "jinja_cache")
+    if scenario == "cold":
+        shutil.rmtree(cache, ignore_errors=True)
+    env = bench_env(workdir, cache)
+    env["BENCH_T0"] = repr(time.time())
+    out = subprocess.run([sys.executable, "-c", CHILD, scenario], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_serve(workdir: str, cold: bool) -> dict:
+    """python serve.py (worker sync) : lancement -> première réponse 200 sur /r/main/."""
+    cache = os.path.join(workdir, "jinja_cache")
+    if cold:
+        shutil.rmtree(cache, ignore_errors=True)
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--worker-class", "sync", "--bind", f"127.0.0.1:{port}",
+         "--log-level", "warning"],
+        cwd=ROOT, env=bench_env(workdir, cache), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                conn.request("GET", "/r/main/")
+                status = conn.getresponse().status
+                conn.close()
+                if status == 200:
+                    return {"spawn_to_first_response_ms": (time.perf_counter() - t0) * 1000}
+            except OSError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("serve.py ne répond pas")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def medians(samples) -> dict:
+    return {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de démarrage MGPR (import -> première réponse)")
+    parser.add_argument("--runs", type=int, default=5, help="essais par scénario (médiane)")
+    parser.add_argument("--serve", action="store_true", help="mesure aussi python serve.py (HTTP)")
+    parser.add_argument("--out", help="fichier JSON de résultats (défaut : bench/results/startup-<date>.json)")
+    args = parser.parse_args()
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "runs": args.runs,
+        "scenarios": {},
+    }
+
+    workdir = tempfile.mkdtemp(prefix="mgpr-startup-")
+    try:
+        print(f"{'scénario':<14}{'import':>9}{'create_app':>12}{'1re réponse':>13}"
+              f"{'4 pages':>9}{'lancement->1re':>16}   (ms, médianes)")
+        for scenario in SCENARIOS:
+            if scenario == "warm":
+                run_child("cold", workdir)  # cache rempli
+            m = medians([run_child(scenario, workdir) for _ in range(args.runs)])
+            report["scenarios"][scenario] = m
+            print(f"{scenario:<14}{m['import_ms']:>9.1f}{m['create_app_ms']:>12.1f}"
+                  f"{m['first_response_ms']:>13.1f}{m['other_pages_ms']:>9.1f}"
+                  f"{m['spawn_to_first_response_ms']:>16.1f}")
+
+        if args.serve:
+            for name, cold in (("serve-cold", True), ("serve-warm", False)):
+                m = medians([run_serve(workdir, cold) for _ in range(args.runs)])
+                report["scenarios"][name] = m
+                print(f"{name:<14}{'':>43}{m['spawn_to_first_response_ms']:>16.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nRésultats : {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Test de charge du registre des votes : aucun vote perdu ni compté deux fois.
+
+Deux phases, à relancer après toute modification de VoteLedger ou du verrou
+par table :
+
+- ledger : sur --tables tables de --players joueurs (un verrou par table),
+  --threads threads tentent d'abord tous de voter pour chaque joueur
+  (--rounds fois) : exactement un vote doit être retenu par votant. Puis ils se disputent les
+  mêmes votants (cast / change / retract au hasard, --ops opérations
+  chacun) ; à la fin, compteurs, votants, maximum et joueurs en tête sont
+  comparés à un recomptage depuis zéro des cibles. Une exception dans un
+  thread (compteur négatif...) est aussi un échec.
+- route : les mêmes threads envoient des milliers de /vote/<votant>/<cible>
+  concurrents à l'application (client de test Flask) pour la table par
+  défaut ; chaque joueur ne doit être compté qu'une fois.
+
+Le basculement entre threads est forcé toutes les quelques microsecondes
+(sys.setswitchinterval) pour multiplier les entrelacements :
+
+    python bench/votes_stress.py
+    python bench/votes_stress.py --threads 64 --ops 20000 --players 300
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game import VoteLedger, player_ids  # noqa: E402
+
+
+def recount_errors(ledger: VoteLedger, joueurs) -> list:
+    """Écarts entre l'état incrémental du registre et un recomptage complet."""
+    pour = dict(ledger.joueur_vote_pour)
+    counts = Counter(pour.values())
+    errors = []
+    for j in joueurs:
+        if ledger.votes[j] != counts.get(j, 0):
+            errors.append(f"votes[{j}] = {ledger.votes[j]}, recompté {counts.get(j, 0)}")
+    if set(ledger.joueurs_ayant_vote) != set(pour):
+        errors.append(f"joueurs_ayant_vote {sorted(ledger.joueurs_ayant_vote)} != votants {sorted(pour)}")
+    max_votes = max(counts.values(), default=0)
+    if ledger.max_votes != max_votes:
+        errors.append(f"max_votes = {ledger.max_votes}, recompté {max_votes}")
+    leaders = {j for j, n in counts.items() if n == max_votes} if max_votes else set()
+    if set(ledger.leaders()) != leaders:
+        errors.append(f"leaders {sorted(ledger.leaders())} != {sorted(leaders)}")
+    return errors
+
+
+def run_threads(threads: int, worker, errors: list) -> float:
+    """
+    Lance worker(n) dans `threads` threads démarrés ensemble ; durée en
+    secondes. Une exception dans un thread est une erreur du test (`errors`).
+    """
+    barrier = threading.Barrier(threads)
+
+    def run(n: int):
+        barrier.wait()
+        try:
+            worker(n)
+        except Exception as e:
+            errors.append(f"thread {n} : {e!r}")
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    return time.perf_counter() - t0
+
+
+def stress_ledger(threads: int, ops: int, players: int, tables: int, rounds: int, seed: int) -> dict:
+    joueurs = player_ids(players)
+    errors = []
+
+    # 1. course au premier vote, `rounds` fois : chaque thread tente de voter
+    #    pour chaque joueur de chaque table ; exactement un cast réussi par votant
+    for round_ in range(rounds):
+        ledgers = [VoteLedger(joueurs) for _ in range(tables)]
+        wins = Counter()
+        wins_lock = threading.Lock()
+
+        def race(n: int):
+            rng = random.Random((seed * 1000 + round_) * 1000 + n)
+            attempts = [(t, j) for t in range(tables) for j in joueurs]
+            rng.shuffle(attempts)
+            for t, votant in attempts:
+                if ledgers[t].cast(votant, rng.choice(joueurs)):
+                    with wins_lock:
+                        wins[t, votant] += 1
+
+        run_threads(threads, race, errors)
+        for t, ledger in enumerate(ledgers):
+            doubles = [j for j in joueurs if wins[t, j] > 1]
+            lost = [j for j in joueurs if wins[t, j] == 0]
+            if doubles or lost:
+                errors.append(f"tour {round_}, table {t} : votes doublés {doubles}, perdus {lost}")
+            if sum(ledger.votes.values()) != players:
+                errors.append(f"tour {round_}, table {t} : {sum(ledger.votes.values())} voix pour {players} votants")
+            errors += [f"tour {round_}, table {t} : {e}" for e in recount_errors(ledger, joueurs)]
+
+    # 2. cast / change / retract au hasard sur les mêmes votants, puis recomptage
+    ledgers = [VoteLedger(joueurs) for _ in range(tables)]
+
+    def mixed(n: int):
+        rng = random.Random(seed * 1000 + threads + n)
+        for _ in range(ops):
+            ledger = ledgers[rng.randrange(tables)]
+            votant = rng.choice(joueurs)
+            op = rng.random()
+            if op < 0.5:
+                ledger.cast(votant, rng.choice(joueurs))
+            elif op < 0.8:
+                ledger.change(votant, rng.choice(joueurs))
+            else:
+                ledger.retract(votant)
+
+    elapsed = run_threads(threads, mixed, errors)
+    for t, ledger in enumerate(ledgers):
+        errors += [f"table {t} : {e}" for e in recount_errors(ledger, joueurs)]
+
+    return {
+        "casts": rounds * threads * tables * players,
+        "operations": threads * ops,
+        "ops_per_s": threads * ops / elapsed,
+        "errors": errors,
+    }
+
+
+def stress_route(threads: int, attempts: int, seed: int) -> dict:
+    os.environ.setdefault("SOCKETIO_ASYNC_MODE", "threading")
+    os.environ["EVENT_LOG"] = ""
+    os.environ["CHECKPOINT_PATH"] = ""
+    os.environ["ANALYTICS_DB"] = ""
+    os.environ["STATE_BACKEND"] = "memory"
+    import app as A
+
+    flask_app = A.create_app()
+    flask_app.test_client().get("/r/main/")   # table par défaut créée
+    joueurs = A.rooms.get("main").joueurs
+
+    def worker(n: int):
+        rng = random.Random(seed * 1000 + n)
+        client = flask_app.test_client()
+        for _ in range(attempts):
+            votant, cible = rng.sample(joueurs, 2)
+            client.get(f"/r/main/vote/{votant}/{cible}")
+
+    errors = []
+    run_threads(threads, worker, errors)
+
+    ledger = A.rooms.get("main").ledger
+    errors += recount_errors(ledger, joueurs)
+    if ledger.total_voters != len(joueurs):
+        errors.append(f"{ledger.total_voters} votants sur {len(joueurs)} après {threads * attempts} requêtes")
+    if sum(ledger.votes.values()) != len(joueurs):
+        errors.append(f"{sum(ledger.votes.values())} voix pour {len(joueurs)} votants")
+    return {"requests": threads * attempts, "voters": ledger.total_voters, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du registre des votes (votes perdus / doublés)")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=5000, help="opérations par thread (phase ledger)")
+    parser.add_argument("--players", type=int, default=12)
+    parser.add_argument("--tables", type=int, default=4, help="tables disputées en même temps (phase ledger)")
+    parser.add_argument("--rounds", type=int, default=50, help="courses au premier vote (phase ledger)")
+    parser.add_argument("--requests", type=int, default=100, help="requêtes /vote par thread (phase route)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sys.setswitchinterval(1e-6)
+
+    ledger = stress_ledger(args.threads, args.ops, args.players, args.tables, args.rounds, args.seed)
+    print(f"ledger : {ledger['casts']} votes concurrents, puis {ledger['operations']} opérations "
+          f"({ledger['ops_per_s']:.0f} op/s), {len(ledger['errors'])} écart(s)")
+    route = stress_route(args.threads, args.requests, args.seed)
+    print(f"route  : {route['requests']} requêtes /vote, {route['voters']} votants, "
+          f"{len(route['errors'])} écart(s)")
+
+    errors = ledger["errors"] + route["errors"]
+    for e in errors[:20]:
+        print("  " + e)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
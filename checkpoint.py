@@ -0,0 +1,84 @@
+"""
+Checkpoint binaire des tables, pour redémarrer sans perdre les parties en cours.
+
+À l'arrêt (SIGTERM, envoyé par gunicorn ou systemd), toutes les tables du
+MemoryStore sont écrites d'un bloc (pickle) dans un fichier temporaire puis
+renommées : le checkpoint est toujours complet. Au démarrage, l'application le
+recharge avant de servir la moindre requête (aucun nouveau tirage des rôles),
+puis rejoue la fin du journal des événements écrite après lui.
+
+Le checkpoint est consommé au chargement : après un crash (pas de SIGTERM),
+c'est le snapshot du journal qui sert de point de départ, pas un état périmé.
+"""
+import os
+import pickle
+import signal
+import time
+
+# Changé si le contenu du fichier n'est plus compatible
+FORMAT = 4
+
+
+def save(store, path: str, log_offset: int = 0):
+    """Écrit les tables de `store` (et la position atteinte dans le journal)."""
+    rooms = {}
+    for room_id in store.room_ids():
+        # sous le verrou de la table : jamais d'état à moitié modifié
+        with store.transaction(room_id) as room:
+            rooms[room_id] = pickle.dumps(room, pickle.HIGHEST_PROTOCOL)
+
+    payload = pickle.dumps(
+        {"format": FORMAT, "saved_at": time.time(), "log_offset": log_offset, "rooms": rooms},
+        pickle.HIGHEST_PROTOCOL,
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(payload)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def load(path: str):
+    """(room_id -> GameRoom, position dans le journal), ou None sans checkpoint utilisable."""
+    try:
+        with open(path, "rb") as fh:
+            data = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    finally:
+        # consommé : un crash ultérieur ne doit pas ramener cet état
+        if os.path.exists(path):
+            os.replace(path, path + ".prev")
+
+    if data.get("format") != FORMAT:
+        return None
+    rooms = {room_id: pickle.loads(blob) for room_id, blob in data["rooms"].items()}
+    return rooms, data["log_offset"]
+
+
+def on_sigterm(callback):
+    """
+    Appelle callback() à la réception de SIGTERM, puis le gestionnaire déjà en
+    place (arrêt propre du worker gunicorn) ou, à défaut, l'arrêt du processus.
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handler(signum, frame):
+        try:
+            callback()
+        finally:
+            if callable(previous):
+                previous(signum, frame)
+            elif previous != signal.SIG_IGN:
+                raise SystemExit(128 + signum)
+
+    try:
+        signal.signal(signal.SIGTERM, handler)
+    except ValueError:
+        # hors du thread principal (le test par threading.main_thread() est
+        # faussé par le monkey-patching d'eventlet)
+        return False
+    return True
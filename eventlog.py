@@ -0,0 +1,318 @@
+"""
+Journal des événements de jeu (append-only), avec snapshots et rejeu.
+
+Chaque modification d'une table (vote, reveal, élimination, message...) y est
+ajoutée sous forme d'une ligne JSON compacte :
+
+    [room_id, version, horodatage, type, données]
+
+Les écritures sont groupées : les lignes attendent en mémoire puis sont écrites
+et synchronisées sur disque (fsync) ensemble, dès que `batch_size` lignes sont
+en attente et au plus tard toutes les `fsync_interval` secondes. Un crash peut
+donc perdre au plus les événements de cet intervalle.
+
+Un snapshot (<journal>.snap) enregistre périodiquement, en tâche de fond,
+l'état de toutes les tables et la position atteinte dans le journal : load() recharge le dernier
+snapshot puis ne rejoue que la fin du journal. Plusieurs workers peuvent
+écrire dans le même journal (O_APPEND) : le rejeu remet les événements de
+chaque table dans l'ordre de leurs versions.
+
+scan() relit le journal séquentiellement, pour analyser des milliers de
+parties après coup :
+
+    python eventlog.py stats [journal]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+
+from game import GameRoom
+
+Event = namedtuple("Event", "room_id version ts type data")
+
+# Taille des lectures lors d'un scan séquentiel
+READ_BUFFER = 1024 * 1024
+
+
+class EventLog:
+
+    def __init__(self, path: str, fsync_interval: float = 0.2, batch_size: int = 256,
+                 snapshot_every: int = 5000):
+        self.path = path
+        self.snapshot_path = path + ".snap"
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+
+        self._pending = []           # lignes encodées, pas encore écrites
+        self._since_snapshot = 0
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_scheduled = False
+        self._flusher_pid = None     # le thread d'écriture ne survit pas à un fork
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        _drop_partial_line(path)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def append(self, room_id: str, version: int, type_: str, data: dict):
+        line = json.dumps(
+            [room_id, version, round(time.time(), 3), type_, data],
+            separators=(",", ":"), ensure_ascii=False,
+        ).encode() + b"\n"
+
+        with self._lock:
+            self._pending.append(line)
+            self._since_snapshot += 1
+            full = len(self._pending) >= self.batch_size
+
+        if full:
+            self.flush()
+        elif self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def flush(self):
+        """Écrit les événements en attente (un seul write) puis fsync."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                os.write(self._fd, b"".join(pending))
+        if pending:
+            os.fsync(self._fd)
+
+    def position(self) -> int:
+        """Taille du journal une fois les événements en attente écrits."""
+        self.flush()
+        return os.fstat(self._fd).st_size
+
+    def _start_flusher(self):
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.fsync_interval)
+            self.flush()
+
+    # -------------------------------------------------
+    # SNAPSHOTS
+    # -------------------------------------------------
+
+    @property
+    def snapshot_due(self) -> bool:
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot_in_background(self, store):
+        """
+        snapshot() dans un thread à part : la requête qui l'a déclenché n'attend
+        ni la sérialisation des tables ni le fsync. Un seul à la fois.
+        """
+        with self._lock:
+            if self._snapshot_scheduled:
+                return
+            self._snapshot_scheduled = True
+        threading.Thread(target=self._snapshot_task, args=(store,), daemon=True).start()
+
+    def _snapshot_task(self, store):
+        try:
+            self.snapshot(store)
+        finally:
+            self._snapshot_scheduled = False
+
+    def snapshot(self, store):
+        """Enregistre l'état de toutes les tables et la position atteinte dans le journal."""
+        if not self._snapshot_lock.acquire(blocking=False):
+            return  # un autre thread s'en occupe déjà
+        try:
+            self._since_snapshot = 0
+            offset = self.position()
+
+            states = {}
+            for room_id in store.room_ids():
+                # sous le verrou de la table : tout événement déjà écrit est enregistré
+                with store.transaction(room_id) as room:
+                    states[room_id] = room.to_dict()
+
+            payload = json.dumps({"offset": offset, "rooms": states}, separators=(",", ":")).encode()
+            tmp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(payload)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.snapshot_path)
+        finally:
+            self._snapshot_lock.release()
+
+    def close(self):
+        self.flush()
+        os.close(self._fd)
+
+
+def _drop_partial_line(path: str):
+    """Tronque une dernière ligne incomplète (crash pendant une écriture)."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as fh:
+        size = fh.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        fh.seek(size - 1)
+        if fh.read(1) == b"\n":
+            return
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            fh.seek(pos - step)
+            chunk = fh.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl >= 0:
+                fh.truncate(pos - step + nl + 1)
+                return
+            pos -= step
+        fh.truncate(0)
+
+
+# -----------------------------------------------------
+# LECTURE ET REJEU
+# -----------------------------------------------------
+
+def scan(path: str, offset: int = 0, types=None):
+    """
+    Événements du journal à partir de `offset`, dans l'ordre du fichier.
+    `types` : ne garde que ces types (filtrés avant décodage JSON).
+    """
+    needles = [f',"{t}",'.encode() for t in types] if types else None
+
+    with open(path, "rb", buffering=READ_BUFFER) as fh:
+        fh.seek(offset)
+        for line in fh:
+            if not line.endswith(b"\n"):
+                break  # écriture interrompue
+            if needles and not any(n in line for n in needles):
+                continue
+            event = Event(*json.loads(line))
+            if types is None or event.type in types:
+                yield event
+
+
+def apply_event(room: GameRoom, event: Event):
+    """Rejoue un événement sur la table (mêmes méthodes que les routes)."""
+    _apply(room, event.type, event.data)
+    room.version = event.version
+
+
+def _apply(room: GameRoom, t: str, d: dict):
+    if t == "batch":
+        # commandes admin groupées (une seule version) : {"events": [{"type": ..., ...}]}
+        for sub in d["events"]:
+            _apply(room, sub["type"], sub)
+    elif t == "start":
+        room.start()
+    elif t == "vote":
+        room.cast_vote(d["votant"], d["cible"])
+    elif t == "reveal":
+        room.reveal()
+    elif t == "next_night":
+        room.reset_round_keep_eliminated()
+    elif t == "reset":
+        room.reset_all(d["roles"])
+    elif t == "eliminate":
+        room.eliminate(d["joueur"])
+    elif t == "resurrect":
+        room.resurrect(d["joueur"])
+    elif t == "couple":
+        room.set_couple(d["players"])
+    elif t == "swap":
+        room.swap_roles(d["j1"], d["j2"])
+    elif t == "exorcise":
+        room.exorcise(d["joueur"])
+    elif t == "night_action":
+        room.set_night_action(d["joueur"], d["action"])
+    elif t == "last_will":
+        room.add_last_will(d["joueur"], d["text"])
+    elif t == "necro_reveal":
+        room.reveal_last_will(d["id"])
+    elif t == "message":
+        room.push_admin_message(d["audience"], d["players"], d["text"])
+    elif t == "read":
+        room.mark_messages_read(d["joueur"], d.get("upto"))
+    else:
+        raise ValueError(f"Événement inconnu : {t!r}")
+
+
+def load(path: str) -> dict:
+    """room_id -> GameRoom : dernier snapshot + rejeu de la fin du journal."""
+    rooms = {}
+    offset = 0
+
+    snapshot_path = path + ".snap"
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, "rb") as fh:
+            snap = json.load(fh)
+        offset = snap["offset"]
+        rooms = {room_id: GameRoom.from_dict(state) for room_id, state in snap["rooms"].items()}
+
+    return replay(path, rooms, offset)
+
+
+def replay(path: str, rooms: dict, offset: int = 0) -> dict:
+    """Rejoue sur `rooms` (room_id -> GameRoom) les événements du journal à partir de `offset`."""
+    if not os.path.exists(path):
+        return rooms
+
+    tail = defaultdict(list)
+    for event in scan(path, offset):
+        tail[event.room_id].append(event)
+
+    for room_id, events in tail.items():
+        events.sort(key=lambda e: e.version)
+        for event in events:
+            room = rooms.get(room_id)
+            if event.type == "create":
+                if room is None:
+                    room = rooms[room_id] = GameRoom(room_id, event.data["joueurs"], event.data["roles"])
+                    room.version = event.version
+                continue
+            # absent du snapshot ou déjà inclus dedans
+            if room is None or event.version <= room.version:
+                continue
+            apply_event(room, event)
+
+    return rooms
+
+
+def restore(store, path: str) -> int:
+    """Recharge les tables du journal dans un MemoryStore vide ; renvoie leur nombre."""
+    rooms = load(path)
+    for room in rooms.values():
+        store.put(room)
+    return len(rooms)
+
+
+def stats(path: str):
+    """Résumé du journal : événements par type, parties, votes."""
+    by_type = Counter()
+    rooms = set()
+    games = 0
+    for event in scan(path):
+        rooms.add(event.room_id)
+        # commandes groupées : comptées une par une
+        types = [sub["type"] for sub in event.data["events"]] if event.type == "batch" else [event.type]
+        for t in types:
+            by_type[t] += 1
+            if t in ("create", "reset"):
+                games += 1
+
+    print(f"{sum(by_type.values())} événements, {len(rooms)} tables, {games} parties")
+    for t, n in by_type.most_common():
+        print(f"  {t:<14}{n}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        stats(sys.argv[2] if len(sys.argv) > 2 else os.environ.get("EVENT_LOG", "instance/events.log"))
+    else:
+        print("usage: python eventlog.py stats [journal]")
@@ -0,0 +1,1167 @@
+"""
+Moteur de jeu : état d'une table (GameRoom) et registre des tables.
+
+Aucune dépendance à Flask ici : les routes de app.py récupèrent la table
+demandée dans le stockage (storage.py) puis lisent / modifient son état.
+"""
+import bisect
+import random
+import re
+import threading
+from array import array
+from collections import Counter
+from collections.abc import Mapping, MutableSet
+
+
+# === LISTE DES RÔLES DE BASE ===
+base_roles = [
+    {
+        "name": "Enchanteresse",
+        "icon": "role_enchanteresse.png",
+        "icon_list": "role_enchanteresse2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": (
+            "Possède une relique de vie et une de mort. Chacune peut être utilisée une seule fois dans la partie, ou pas du tout."
+        ),
+    },
+    {
+        "name": "Démon",
+        "icon": "role_demon.png",
+        "icon_list": "role_demon2.png",
+        "camp": "Esprit Malfaiteur",
+        "description": "Chaque nuit les démons choisissent ensemble un joueur à éliminer.",
+    },
+    {
+        "name": "Sans visage",
+        "icon": "role_sans_visage.png",
+        "icon_list": "role_sans_visage2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "Chaque nuit, observe secrètement le groupe sans être vu.",
+    },
+    {
+        "name": "Cartomancienne",
+        "icon": "role_cartomancienne.png",
+        "icon_list": "role_cartomancienne2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "Chaque nuit, désigne un joueur pour connaître son camp",
+    },
+    {
+        "name": "Amant maudit",
+        "icon": "role_amant_maudit.png",
+        "icon_list": "role_amant_maudit2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "À la première nuit, lie deux joueurs comme amants. Si un membre du couple meurt, l'autre le suit dans la tombe. Il choisit un nouveau couple si le couple actuel meurt",
+    },
+    {
+        "name": "Esprit farceur",
+        "icon": "role_esprit_farceur.png",
+        "icon_list": "role_esprit_farceur2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "Une fois dans la partie, échange sa carte avec celle d’un autre joueur.",
+    },
+    {
+        "name": "Rédempteur",
+        "icon": "role_redempteur.png",
+        "icon_list": "role_redempteur2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "Chaque nuit, protège un joueur différent contre l’attaque des démons.",
+    },
+    {
+        "name": "Froussard",
+        "icon": "role_froussard.png",
+        "icon_list": "role_froussard2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "Chaque nuit, choisit un joueur derrière qui il se cache. S’il meurt, il meurt avec lui. Si les démons l'attaquent pendant qu'il est caché, il survit.",
+    },
+    {
+        "name": "Démon",
+        "icon": "role_demon.png",
+        "icon_list": "role_demon2.png",
+        "camp": "Esprit Malfaiteur",
+        "description": "Chaque nuit les démons choisissent ensemble un joueur à éliminer.",
+    },
+    {
+        "name": "Nécromancien",
+        "icon": "role_necromancien.png",
+        "icon_list": "role_necromancien2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "Après chaque tour, peut voir les dérnières volontés des morts",
+    },
+    {
+        "name": "Exorciste",
+        "icon": "role_exorciste.png",
+        "icon_list": "role_exorciste2.png",
+        "camp": "Esprit Bienfaiteur",
+        "description": "Chaque nuit, désigne un joueur pour le réduire au silence : il ne vote pas et ne participe pas au prochain rassemblement. Il ne peut pas être ciblé deux nuits de suite.",
+    },
+    {
+        "name": "Démon",
+        "icon": "role_demon.png",
+        "icon_list": "role_demon2.png",
+        "camp": "Esprit Malfaiteur",
+        "description": "Chaque nuit les démons choisissent ensemble un joueur à éliminer.",
+    },
+]
+
+# Index d'un rôle dans base_roles (sérialisation) ; les doublons (Démon) partagent le premier
+ROLE_INDEX = {}
+for _i, _r in enumerate(base_roles):
+    ROLE_INDEX.setdefault(_r["name"], _i)
+ROLE_BY_NAME = {name: base_roles[i] for name, i in ROLE_INDEX.items()}
+
+# Taille des tables
+MIN_JOUEURS = 5
+MAX_JOUEURS = 300
+
+# Rôles présents en un seul exemplaire (l'état de la table n'en gère qu'un),
+# par ordre de priorité pour les petites tables
+UNIQUE_ROLES = ["Nécromancien", "Amant maudit", "Esprit farceur", "Exorciste"]
+# Rôles qui complètent le paquet, distribués à tour de rôle
+FILLER_ROLES = ["Enchanteresse", "Sans visage", "Cartomancienne", "Rédempteur", "Froussard"]
+
+
+def player_ids(n: int):
+    """Identifiants des joueurs d'une table de n joueurs : "1" à "n"."""
+    return [str(i) for i in range(1, n + 1)]
+
+
+def demon_count(n: int) -> int:
+    """
+    Un Démon pour quatre joueurs, arrondi au plus proche, une demie vers le
+    haut (pas d'arrondi bancaire) : 5 -> 1, 6 -> 2, 10 -> 3, 12 -> 3, 14 -> 4,
+    18 -> 5, 300 -> 75.
+    """
+    return max(1, (n + 2) // 4)
+
+
+def build_deck(n: int):
+    """Paquet de n rôles : Démons proportionnels, rôles uniques, puis rôles de complément."""
+    if not MIN_JOUEURS <= n <= MAX_JOUEURS:
+        raise ValueError(f"Une table compte de {MIN_JOUEURS} à {MAX_JOUEURS} joueurs (pas {n}).")
+
+    deck = [ROLE_BY_NAME["Démon"]] * demon_count(n)
+    deck += [ROLE_BY_NAME[name] for name in UNIQUE_ROLES[:n - len(deck)]]
+    for i in range(n - len(deck)):
+        deck.append(ROLE_BY_NAME[FILLER_ROLES[i % len(FILLER_ROLES)]])
+    return deck
+
+
+# Joueurs par défaut (1 à 12)
+DEFAULT_JOUEURS = player_ids(12)
+
+# À 12 joueurs, le paquet généré est exactement celui des rôles de base
+if sorted(r["name"] for r in build_deck(len(DEFAULT_JOUEURS))) != sorted(r["name"] for r in base_roles):
+    raise ValueError("Le paquet de 12 joueurs doit correspondre aux rôles de base.")
+
+# De 5 à 300 joueurs : n / 4 arrondi au plus proche, une demie vers le haut (n / 4 est exact en flottant)
+if any(not n / 4 - 0.5 < demon_count(n) <= n / 4 + 0.5 for n in range(MIN_JOUEURS, MAX_JOUEURS + 1)):
+    raise ValueError("demon_count doit arrondir n / 4 au plus proche, une demie vers le haut.")
+
+# Identifiant de table autorisé dans les URL /r/<room>/...
+ROOM_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+
+# -----------------------------------------------------
+# RÈGLES (sans état : partagées par GameRoom, simulate.py et analytics.py)
+# -----------------------------------------------------
+
+CAMP_GOOD = "Esprit Bienfaiteur"
+CAMP_EVIL = "Esprit Malfaiteur"
+
+
+def winning_camp(alive: int, evil_alive: int):
+    """Camp vainqueur : plus de Démon vivant, ou Démons au moins aussi nombreux ; None si la partie continue."""
+    if evil_alive == 0:
+        return CAMP_GOOD
+    if evil_alive >= alive - evil_alive:
+        return CAMP_EVIL
+    return None
+
+def day_victims(max_votes: int, leaders, couple_players, eliminated_players=()) -> set:
+    """
+    Joueurs éliminés au dépouillement : le seul joueur en tête (et son amoureux,
+    qui le suit dans la tombe). Personne sans voix, en cas d'égalité, ou si le
+    joueur en tête est déjà éliminé.
+    """
+    if max_votes <= 0 or len(leaders) != 1:
+        return set()
+
+    eliminated = next(iter(leaders))
+    if eliminated in eliminated_players:
+        return set()
+
+    if eliminated in couple_players:
+        return {eliminated, *couple_players}
+    return {eliminated}
+
+
+# Action de nuit de chaque rôle (les autres rôles dorment)
+NIGHT_ACTIONS = {
+    "Démon": "kill",              # vote des Démons pour leur victime
+    "Rédempteur": "protect",      # jamais le même joueur deux nuits de suite
+    "Froussard": "hide",          # se cache derrière un joueur
+    "Cartomancienne": "inspect",  # découvre le camp d'un joueur
+    "Enchanteresse": "relic",     # relique de vie ou de mort, une fois chacune
+    "Exorciste": "silence",       # jamais le même joueur deux nuits de suite
+    "Amant maudit": "couple",     # seulement s'il n'y a pas de couple vivant
+}
+RELICS = ("vie", "mort")
+
+
+def demon_target(choices):
+    """Victime des Démons : le joueur le plus désigné, s'il est seul en tête (sinon personne)."""
+    counts = Counter(choices)
+    if not counts:
+        return None
+    (first, n), *rest = counts.most_common(2)
+    if rest and rest[0][1] == n:
+        return None
+    return first
+
+
+def night_deaths(alive, attacked, protected, hiding, couple_players, cursed=(), saved=()) -> set:
+    """
+    Morts d'une nuit, d'une seule passe :
+    - `attacked` (victime des Démons) meurt, sauf s'il est protégé ou caché
+      (Froussard : clé de `hiding`, Froussard -> joueur derrière lequel il se cache) ;
+    - les joueurs `cursed` (relique de mort) meurent ;
+    - puis, jusqu'à stabilité : un Froussard meurt avec le joueur qui le cachait
+      (chaînes comprises), un amoureux suit l'autre dans la tombe ;
+    - les joueurs `saved` (relique de vie) ne meurent pas cette nuit.
+    """
+    deaths = set()
+    if attacked in alive and attacked not in protected and attacked not in hiding:
+        deaths.add(attacked)
+    deaths.update(p for p in cursed if p in alive)
+    deaths.difference_update(saved)
+
+    hidden_behind = {}
+    for froussard, host in hiding.items():
+        hidden_behind.setdefault(host, []).append(froussard)
+
+    todo = list(deaths)
+    while todo:
+        p = todo.pop()
+        followers = list(hidden_behind.get(p, ()))
+        if p in couple_players:
+            followers += couple_players
+        for f in followers:
+            if f in alive and f not in deaths and f not in saved:
+                deaths.add(f)
+                todo.append(f)
+    return deaths
+
+
+# -----------------------------------------------------
+# REPRÉSENTATION COMPACTE (des milliers de tables en mémoire)
+# -----------------------------------------------------
+#
+# Un joueur est une position dans la table ; les ensembles de joueurs sont des
+# bitsets (bit i = i-ème joueur), les compteurs des tableaux de taille fixe, les
+# rôles un octet par joueur (index dans base_roles). Les vues ci-dessous
+# redonnent aux routes et aux templates les mêmes interfaces qu'avant (set,
+# dict joueur -> valeur), sans copie.
+
+class PlayerIndex:
+    """Joueurs d'une table et leur position : un seul exemplaire par composition de table."""
+
+    __slots__ = ("joueurs", "position")
+
+    def __init__(self, joueurs):
+        self.joueurs = tuple(joueurs)
+        self.position = {j: i for i, j in enumerate(self.joueurs)}
+
+    def __reduce__(self):
+        # copie binaire : rechargé depuis le cache partagé
+        return player_index, (self.joueurs,)
+
+
+_player_indexes = {}
+
+
+def player_index(joueurs) -> PlayerIndex:
+    """Index partagé des joueurs `joueurs` (les tables de même composition partagent le leur)."""
+    key = tuple(joueurs)
+    index = _player_indexes.get(key)
+    if index is None:
+        index = _player_indexes.setdefault(key, PlayerIndex(key))
+    return index
+
+
+class PlayerSet(MutableSet):
+    """
+    Ensemble de joueurs d'une table stocké comme bitset ; s'utilise comme un
+    set (in, add, discard, |=, len), itéré dans l'ordre de la table. Les
+    opérations qui créent un nouvel ensemble (-, &, |) renvoient un set.
+    """
+
+    __slots__ = ("_index", "bits")
+
+    def __init__(self, index: PlayerIndex, players=(), bits: int = 0):
+        self._index = index
+        self.bits = bits
+        for j in players:
+            self.add(j)
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+
+    def __contains__(self, j):
+        i = self._index.position.get(j)
+        return i is not None and self.bits >> i & 1 == 1
+
+    def __iter__(self):
+        joueurs = self._index.joueurs
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            yield joueurs[low.bit_length() - 1]
+            bits ^= low
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def add(self, j):
+        self.bits |= 1 << self._index.position[j]
+
+    def discard(self, j):
+        i = self._index.position.get(j)
+        if i is not None:
+            self.bits &= ~(1 << i)
+
+    def clear(self):
+        self.bits = 0
+
+    def __ior__(self, other):
+        if isinstance(other, PlayerSet) and other._index is self._index:
+            self.bits |= other.bits
+            return self
+        return super().__ior__(other)
+
+    def __repr__(self):
+        return f"PlayerSet({list(self)!r})"
+
+
+class RoleMap(Mapping):
+    """Vue joueur -> rôle (dict de base_roles) sur les index de rôles de la table."""
+
+    __slots__ = ("_index", "_ids")
+
+    def __init__(self, index: PlayerIndex, ids: bytearray):
+        self._index = index
+        self._ids = ids
+
+    def __getitem__(self, j):
+        return base_roles[self._ids[self._index.position[j]]]
+
+    def __iter__(self):
+        return iter(self._index.joueurs)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class VoteCounts(Mapping):
+    """Vue joueur -> nombre de voix sur le tableau des compteurs."""
+
+    __slots__ = ("_index", "_counts")
+
+    def __init__(self, index: PlayerIndex, counts: array):
+        self._index = index
+        self._counts = counts
+
+    def __getitem__(self, j):
+        return self._counts[self._index.position[j]]
+
+    def __iter__(self):
+        return iter(self._index.joueurs)
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class VoteTargets(Mapping):
+    """Vue votant -> cible sur le tableau des cibles (position + 1, 0 = pas de vote)."""
+
+    __slots__ = ("_index", "_targets")
+
+    def __init__(self, index: PlayerIndex, targets: array):
+        self._index = index
+        self._targets = targets
+
+    def __getitem__(self, votant):
+        t = self._targets[self._index.position[votant]]
+        if not t:
+            raise KeyError(votant)
+        return self._index.joueurs[t - 1]
+
+    def __iter__(self):
+        joueurs = self._index.joueurs
+        return (joueurs[i] for i, t in enumerate(self._targets) if t)
+
+    def __len__(self):
+        return len(self._targets) - self._targets.count(0)
+
+
+class LastWill:
+    """Dernière volonté d'un joueur éliminé (lue par le Nécromancien une fois révélée)."""
+
+    __slots__ = ("id", "author", "text", "revealed")
+
+    def __init__(self, id: int, author: str, text: str, revealed: bool = False):
+        self.id = id
+        self.author = author
+        self.text = text
+        self.revealed = revealed
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "author": self.author, "text": self.text, "revealed": self.revealed}
+
+
+class AdminMessage:
+    """Message du maître du jeu ; `to` : destinataires (tuple trié), None = tous."""
+
+    __slots__ = ("id", "text", "audience", "to")
+
+    def __init__(self, id: int, text: str, audience: str, to=None):
+        self.id = id
+        self.text = text
+        self.audience = audience
+        self.to = tuple(to) if to is not None else None
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "text": self.text, "audience": self.audience,
+                "to": list(self.to) if self.to is not None else None}
+
+
+class VoteLedger:
+    """
+    Votes d'un tour : qui a voté, pour qui, et le compte par joueur.
+
+    Chaque opération (cast / retract / change / reset) est atomique sous le
+    verrou propre à la table : un vote est compté exactement une fois, même si
+    plusieurs requêtes du même joueur arrivent en même temps (serveur threadé,
+    gevent, eventlet). Les structures sont modifiées sur place, jamais
+    réaffectées, pour que les lecteurs gardent une référence valide.
+
+    Le décompte est incrémental : on tient à jour, à chaque vote, les joueurs
+    regroupés par nombre de voix (un bitset par nombre) et le maximum courant.
+    max_votes, leaders() et le nombre de votants se lisent donc sans parcourir
+    tous les joueurs. Voix et cibles sont des tableaux indexés par position.
+    """
+
+    __slots__ = ("_lock", "_index", "counts", "targets", "joueurs_ayant_vote", "_buckets", "max_votes", "version")
+
+    def __init__(self, joueurs):
+        self._lock = threading.Lock()
+        self._index = player_index(joueurs)
+        n = len(self._index.joueurs)
+        self.counts = array("H", [0]) * n       # voix reçues par joueur
+        self.targets = array("H", [0]) * n      # cible de chaque votant (position + 1, 0 = pas de vote)
+        self.joueurs_ayant_vote = PlayerSet(self._index)
+
+        # nombre de voix (> 0) -> bitset des joueurs ayant exactement ce nombre
+        self._buckets = {}
+        self.max_votes = 0
+
+        # incrémentée à chaque opération (clé des fragments HTML en cache)
+        self.version = 0
+
+    # Vues dict (mêmes noms que dans les templates)
+    @property
+    def votes(self):
+        return VoteCounts(self._index, self.counts)
+
+    @property
+    def joueur_vote_pour(self):
+        return VoteTargets(self._index, self.targets)
+
+    # copie binaire (checkpoint.py) : le verrou ne se sérialise pas
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_lock"}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._lock = threading.Lock()
+
+    # décompte incrémental (appelé sous verrou)
+
+    def _add(self, i: int, delta: int):
+        bit = 1 << i
+        n = self.counts[i]
+        if n:
+            bucket = self._buckets[n] & ~bit
+            if bucket:
+                self._buckets[n] = bucket
+            else:
+                del self._buckets[n]
+                # le seul joueur en tête perd une voix : il reste en tête avec n - 1
+                if delta < 0 and n == self.max_votes:
+                    self.max_votes = n - 1
+
+        n += delta
+        self.counts[i] = n
+        if n:
+            self._buckets[n] = self._buckets.get(n, 0) | bit
+            if n > self.max_votes:
+                self.max_votes = n
+
+    def cast(self, votant: str, cible: str) -> bool:
+        """Enregistre le vote ; False si le votant a déjà voté ou si la cible est inconnue."""
+        position = self._index.position
+        with self._lock:
+            v, c = position.get(votant), position.get(cible)
+            if v is None or c is None or self.targets[v]:
+                return False
+            self.targets[v] = c + 1
+            self._add(c, 1)
+            self.joueurs_ayant_vote.add(votant)
+            self.version += 1
+            return True
+
+    def retract(self, votant: str) -> bool:
+        """Annule le vote du joueur ; False s'il n'avait pas voté."""
+        with self._lock:
+            v = self._index.position.get(votant)
+            if v is None or not self.targets[v]:
+                return False
+            self._add(self.targets[v] - 1, -1)
+            self.targets[v] = 0
+            self.joueurs_ayant_vote.discard(votant)
+            self.version += 1
+            return True
+
+    def change(self, votant: str, cible: str) -> bool:
+        """Reporte le vote du joueur sur une autre cible (ou vote s'il n'avait pas voté)."""
+        position = self._index.position
+        with self._lock:
+            v, c = position.get(votant), position.get(cible)
+            if v is None or c is None:
+                return False
+            previous = self.targets[v]
+            if previous == c + 1:
+                return True
+            if previous:
+                self._add(previous - 1, -1)
+            self.targets[v] = c + 1
+            self._add(c, 1)
+            self.joueurs_ayant_vote.add(votant)
+            self.version += 1
+            return True
+
+    def reset(self):
+        """Nouveau tour : compteurs à zéro, sur place."""
+        with self._lock:
+            zeros = array("H", [0]) * len(self.counts)
+            self.counts[:] = zeros
+            self.targets[:] = zeros
+            self.joueurs_ayant_vote.clear()
+            self._buckets.clear()
+            self.max_votes = 0
+            self.version += 1
+
+    @property
+    def total_voters(self) -> int:
+        return len(self.joueurs_ayant_vote)
+
+    def leaders(self) -> PlayerSet:
+        """Joueurs à égalité en tête (ensemble vide si aucune voix)."""
+        return PlayerSet(self._index, bits=self._buckets.get(self.max_votes, 0))
+
+    def top_voted(self):
+        """Joueurs en tête, dans l'ordre des joueurs de la table."""
+        return list(self.leaders())
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "votes": dict(self.votes),
+                "joueurs_ayant_vote": sorted(self.joueurs_ayant_vote),
+                "joueur_vote_pour": dict(self.joueur_vote_pour),
+                "votes_version": self.version,
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VoteLedger":
+        ledger = cls(data.get("joueurs") or list(data["votes"]))
+        position = ledger._index.position
+        for cible, n in data["votes"].items():
+            if n:
+                ledger._add(position[cible], n)
+        for votant, cible in data["joueur_vote_pour"].items():
+            ledger.targets[position[votant]] = position[cible] + 1
+        for j in data["joueurs_ayant_vote"]:
+            ledger.joueurs_ayant_vote.add(j)
+        ledger.version = data.get("votes_version", 0)
+        return ledger
+
+
+class AdminMessages:
+    """
+    Messages du maître du jeu pour une table.
+
+    Un message n'est stocké qu'une fois avec son audience ("all", "demons",
+    "single") et ses destinataires (None = tous, résolus à l'envoi). Chaque
+    joueur a un curseur de lecture : marquer ses messages comme lus revient
+    à avancer ce curseur jusqu'au dernier id qui lui est adressé. Curseurs et
+    derniers ids ne sont stockés que pour les joueurs concernés (0 sinon).
+    `unread` : total des messages non lus, tous joueurs confondus (métriques).
+    """
+
+    __slots__ = ("_index", "messages", "next_id", "read_upto", "_last_all", "_last_for", "unread")
+
+    def __init__(self, joueurs, next_id: int = 1):
+        self._index = player_index(joueurs)
+        self.messages = []                           # AdminMessage, par id croissant
+        self.next_id = next_id
+        self.read_upto = {}                          # joueur -> dernier id lu
+
+        # dernier id adressé à tous / à chaque joueur en particulier
+        self._last_all = 0
+        self._last_for = {}
+        self.unread = 0
+
+    def push(self, audience: str, players, text: str):
+        """Enregistre le message (une seule fois) ; None si aucun destinataire."""
+        position = self._index.position
+        players = [j for j in players if j in position]
+        if not players:
+            return None
+
+        msg = AdminMessage(self.next_id, text, audience, None if audience == "all" else sorted(players))
+        self.next_id += 1
+        self._index_message(msg)
+        self.unread += len(self._index.joueurs) if msg.to is None else len(msg.to)
+        return msg
+
+    def _index_message(self, msg: AdminMessage):
+        self.messages.append(msg)
+        if msg.to is None:
+            self._last_all = msg.id
+        else:
+            for j in msg.to:
+                self._last_for[j] = msg.id
+
+    def last_id(self, joueur: str) -> int:
+        return max(self._last_all, self._last_for.get(joueur, 0))
+
+    def has_unread(self, joueur: str) -> bool:
+        return self.last_id(joueur) > self.read_upto.get(joueur, 0)
+
+    def for_player(self, joueur: str, after: int = 0) -> list:
+        """Messages adressés à `joueur` dont l'id est > after."""
+        start = bisect.bisect_right(self.messages, after, key=lambda m: m.id)
+        return [m for m in self.messages[start:] if m.to is None or joueur in m.to]
+
+    def unread_count(self, joueur: str) -> int:
+        return len(self.for_player(joueur, self.read_upto.get(joueur, 0)))
+
+    def mark_read(self, joueur: str, upto: int = None) -> bool:
+        """Avance le curseur (jusqu'à `upto` au plus) ; False s'il n'a pas bougé."""
+        last = self.last_id(joueur)
+        upto = last if upto is None else min(upto, last)
+        previous = self.read_upto.get(joueur, 0)
+        if upto <= previous:
+            return False
+        self.unread -= sum(1 for m in self.for_player(joueur, previous) if m.id <= upto)
+        self.read_upto[joueur] = upto
+        return True
+
+    # copie binaire (checkpoint.py)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    # sérialisation (backends de stockage partagés)
+
+    def to_dict(self) -> dict:
+        return {
+            "messages": [m.to_dict() for m in self.messages],
+            "next_id": self.next_id,
+            "read_upto": self.read_upto,
+            "unread": self.unread,
+        }
+
+    @classmethod
+    def from_dict(cls, joueurs, data: dict) -> "AdminMessages":
+        board = cls(joueurs)
+        for msg in data["messages"]:
+            board._index_message(AdminMessage(**msg))
+        board.next_id = data["next_id"]
+        board.read_upto.update((j, n) for j, n in data["read_upto"].items() if n)
+        if "unread" in data:
+            board.unread = data["unread"]
+        else:
+            board.unread = sum(board.unread_count(j) for j in board._index.joueurs)
+        return board
+
+
+class GameRoom:
+    """État complet d'une table de jeu."""
+
+    __slots__ = (
+        "room_id", "_index", "role_ids", "role_players", "ledger", "admin_started", "reveal_results",
+        "eliminated_players", "exorcised_player", "couple_players",
+        "night_actions", "last_protected", "last_exorcised", "relics_used", "night_eliminated_bits",
+        "inspections",
+        "necro_messages", "necro_next_id", "last_wills", "admin_messages",
+        "version", "roles_version", "eliminated_version", "couple_version",
+    )
+
+    def __init__(self, room_id: str, joueurs=None, roles=None):
+        self.room_id = room_id
+        self._index = player_index(joueurs or DEFAULT_JOUEURS)
+
+        # Rôles mélangés : index dans base_roles, un octet par joueur (vue dict : self.roles)
+        self.role_ids = bytearray(len(self._index.joueurs))
+        # Index secondaire : bitset des joueurs de chaque rôle (par index dans base_roles)
+        self.role_players = [0] * len(base_roles)
+
+        # État du jeu
+        self.ledger = VoteLedger(self.joueurs)
+        self.admin_started = False
+        self.reveal_results = False
+        self.eliminated_players = PlayerSet(self._index)
+        self.exorcised_player = None
+
+        # Couple choisi par l'Amant maudit (contient 0 ou 2 joueurs)
+        self.couple_players = PlayerSet(self._index)
+
+        # Nuit : actions soumises par les joueurs (joueur -> action), résolues au Start
+        self.night_actions = {}
+        self.last_protected = {}       # Rédempteur -> protégé de la nuit précédente
+        self.last_exorcised = None     # Exorciste : dernier exorcisé (action de nuit ou admin)
+        self.relics_used = {}          # Enchanteresse -> reliques déjà utilisées
+        self.night_eliminated_bits = 0  # éliminés au début de la nuit (bitset), pour son rapport
+        self.inspections = {}          # Cartomancienne -> (joueur, camp) découvert ce tour
+
+        # Messages des morts (pour Nécromancien), par id croissant à partir de 1
+        self.necro_messages = []
+        self.necro_next_id = 1
+        self.last_wills = {}        # auteur -> message (un seul par joueur)
+
+        # Messages du maître du jeu (stockés une fois, curseur de lecture par joueur)
+        self.admin_messages = AdminMessages(self.joueurs)
+
+        # Version de l'état : incrémentée à chaque modification (ETag / long-poll)
+        self.version = 0
+
+        # Versions par partie de l'état, pour les fragments HTML en cache
+        # (les votes ont la leur : ledger.version)
+        self.roles_version = 0
+        self.eliminated_version = 0
+        self.couple_version = 0
+
+        self.assign_random_roles(roles)
+
+    @property
+    def joueurs(self):
+        """Joueurs de la table, dans l'ordre (tuple partagé entre tables de même composition)."""
+        return self._index.joueurs
+
+    @property
+    def roles(self):
+        """Vue joueur -> rôle (dict de base_roles)."""
+        return RoleMap(self._index, self.role_ids)
+
+    # Vues sur le registre des votes (mêmes noms que dans les templates)
+    @property
+    def votes(self):
+        return self.ledger.votes
+
+    @property
+    def joueurs_ayant_vote(self):
+        return self.ledger.joueurs_ayant_vote
+
+    @property
+    def joueur_vote_pour(self):
+        return self.ledger.joueur_vote_pour
+
+    # -------------------------------------------------
+    # UTILITAIRES
+    # -------------------------------------------------
+
+    def assign_random_roles(self, indexes: dict = None):
+        """Distribue les rôles au hasard ; `indexes` impose une distribution (rejeu du journal)."""
+        if indexes is not None:
+            position = self._index.position
+            for j, i in indexes.items():
+                self.role_ids[position[j]] = ROLE_INDEX[base_roles[i]["name"]]
+        else:
+            shuffled = build_deck(len(self.joueurs))
+            random.shuffle(shuffled)
+            self.role_ids[:] = bytes(ROLE_INDEX[r["name"]] for r in shuffled)
+        self.roles_version += 1
+        self._index_roles()
+
+    def _index_roles(self):
+        self.role_players = [0] * len(base_roles)
+        for i, role_id in enumerate(self.role_ids):
+            self.role_players[role_id] |= 1 << i
+
+    def role_indexes(self) -> dict:
+        """Rôles sous forme d'index dans base_roles (sérialisation, journal)."""
+        return dict(zip(self.joueurs, self.role_ids))
+
+    def get_lover_partner(self, player_id: str):
+        """Retourne l'autre amoureux si player_id est dans le couple."""
+        if player_id in self.couple_players and len(self.couple_players) == 2:
+            for p in self.couple_players:
+                if p != player_id:
+                    return p
+        return None
+
+    def get_necromancer(self):
+        """Retourne le numéro du joueur qui est Nécromancien, ou None."""
+        bits = self.role_players[ROLE_INDEX["Nécromancien"]]
+        return self.joueurs[(bits & -bits).bit_length() - 1] if bits else None
+
+    def unrevealed_last_wills(self) -> int:
+        """Dernières volontés pas encore révélées au Nécromancien."""
+        return sum(not m.revealed for m in self.necro_messages)
+
+    def player_has_last_will(self, joueur: str) -> bool:
+        """True si ce joueur a déjà écrit une dernière volonté."""
+        return joueur in self.last_wills
+
+    def get_players_by_role(self, role_name: str):
+        """Retourne la liste des joueurs dont le rôle (name) correspond."""
+        role_id = ROLE_INDEX.get(role_name)
+        if role_id is None:
+            return []
+        return list(PlayerSet(self._index, bits=self.role_players[role_id]))
+
+    def push_admin_message(self, audience: str, target_players, text: str):
+        """Message admin pour une audience ("all", "demons", "single") déjà résolue en joueurs."""
+        return self.admin_messages.push(audience, target_players, text)
+
+    def mark_messages_read(self, joueur: str, upto: int = None) -> bool:
+        return self.admin_messages.mark_read(joueur, upto)
+
+    def top_voted(self):
+        """(max_votes, joueurs à égalité en tête) ; aucun joueur en tête sans voix."""
+        return self.ledger.max_votes, self.ledger.top_voted()
+
+    def lover_map(self):
+        """Mapping amoureux -> amoureux pour l'affichage."""
+        lover_map = {}
+        if len(self.couple_players) == 2:
+            cp = list(self.couple_players)
+            lover_map[cp[0]] = cp[1]
+            lover_map[cp[1]] = cp[0]
+        return lover_map
+
+    # -------------------------------------------------
+    # ACTIONS
+    # -------------------------------------------------
+
+    def start(self):
+        """
+        Fin de la nuit et ouverture du vote. La nuit est toujours résolue, même
+        sans action : rapport de la nuit, et les cibles de la veille (Rédempteur,
+        Exorciste) ne sont plus interdites la nuit suivante. Un Start pendant le
+        jour ne résout rien.
+        """
+        if not self.admin_started:
+            self.resolve_night()
+        self.admin_started = True
+
+    def exorcise(self, joueur: str):
+        self.exorcised_player = joueur
+        self.last_exorcised = joueur
+
+    def cast_vote(self, votant: str, cible: str) -> bool:
+        """Enregistre le vote ; False si le votant a déjà voté."""
+        return self.ledger.cast(votant, cible)
+
+    def eliminate_top_voted(self):
+        """Élimine le joueur le plus voté (et son amoureux) s'il est seul en tête."""
+        victims = day_victims(
+            self.ledger.max_votes, self.ledger.leaders(), self.couple_players, self.eliminated_players,
+        )
+        if victims:
+            self.eliminated_players |= victims
+            self.eliminated_version += 1
+
+    def eliminate(self, joueur: str):
+        self.eliminated_players.add(joueur)
+        self.eliminated_version += 1
+
+    def resurrect(self, joueur: str):
+        self.eliminated_players.discard(joueur)
+        self.eliminated_version += 1
+
+    def set_couple(self, players):
+        self.couple_players.clear()
+        self.couple_players |= players
+        self.couple_version += 1
+
+    def reveal(self):
+        self.reveal_results = True
+        self.eliminate_top_voted()
+
+    def add_last_will(self, joueur: str, text: str):
+        msg = LastWill(self.necro_next_id, joueur, text)
+        self.necro_messages.append(msg)
+        self.last_wills[joueur] = msg
+        self.necro_next_id += 1
+
+    def reveal_last_will(self, msg_id: int) -> bool:
+        """Marque un message comme révélé au Nécromancien."""
+        i = msg_id - 1
+        if not 0 <= i < len(self.necro_messages) or self.necro_messages[i].id != msg_id:
+            return False
+        self.necro_messages[i].revealed = True
+        return True
+
+    # -------------------------------------------------
+    # NUIT
+    # -------------------------------------------------
+
+    def night_kind(self, joueur: str):
+        """Action de nuit du rôle actuel du joueur (NIGHT_ACTIONS), ou None."""
+        role = self.roles.get(joueur)
+        return NIGHT_ACTIONS.get(role["name"]) if role else None
+
+    def check_night_action(self, joueur: str, action: dict):
+        """Message d'erreur si l'action de nuit n'est pas permise, None sinon."""
+        kind = self.night_kind(joueur)
+        if self.admin_started:
+            return "La nuit est terminée."
+        if joueur in self.eliminated_players:
+            return "Les morts n'agissent plus."
+        if kind is None or action.get("kind") != kind:
+            return "Votre rôle n'agit pas la nuit."
+
+        targets = action.get("targets") if kind == "couple" else [action.get("target")]
+        if not targets or not all(t in self.roles and t not in self.eliminated_players for t in targets):
+            return "Choisissez un joueur vivant."
+
+        target = targets[0]
+        if kind in ("kill", "hide", "inspect", "silence") and target == joueur:
+            return "Vous ne pouvez pas vous choisir vous-même."
+        if kind == "protect" and target == self.last_protected.get(joueur):
+            return "Ce joueur était déjà protégé la nuit dernière."
+        if kind == "silence" and target == self.last_exorcised:
+            return "Ce joueur était déjà exorcisé la nuit dernière."
+        if kind == "inspect" and joueur in self.inspections:
+            return "Les cartes ont déjà parlé cette nuit."
+        if kind == "relic" and (action.get("relic") not in RELICS
+                                or action["relic"] in self.relics_used.get(joueur, ())):
+            return "Cette relique n'est plus disponible."
+        if kind == "couple":
+            if len(set(targets)) != 2:
+                return "Choisissez deux joueurs différents."
+            if self.couple_players - self.eliminated_players:
+                return "Le couple est déjà formé."
+        return None
+
+    def set_night_action(self, joueur: str, action: dict):
+        """
+        Enregistre (ou remplace) l'action de nuit du joueur, déjà vérifiée. La
+        Cartomancienne a sa réponse tout de suite (page du rôle et messages),
+        pas au Start : elle doit pouvoir s'en servir avant le vote.
+        """
+        self.night_actions[joueur] = action
+        if action["kind"] == "inspect":
+            t = action["target"]
+            camp = self.roles[t]["camp"]
+            self.inspections[joueur] = (t, camp)
+            self.push_admin_message("single", [joueur], f"Cartomancienne : Joueur {t} est {camp}.")
+
+    def resolve_night(self) -> set:
+        """
+        Résout d'une seule passe les actions de la nuit, dans l'ordre des
+        joueurs de la table (déterministe : rejouée à l'identique depuis le
+        journal) ; renvoie les joueurs morts cette nuit.
+        """
+        actions = {}
+        for j in self.joueurs:
+            a = self.night_actions.get(j)
+            # rôle échangé ou joueur éliminé depuis la soumission : action perdue
+            if a is not None and j not in self.eliminated_players and a["kind"] == self.night_kind(j):
+                actions.setdefault(a["kind"], []).append((j, a))
+        self.night_actions = {}
+
+        couples = actions.get("couple")
+        if couples and not self.couple_players - self.eliminated_players:
+            self.set_couple(couples[0][1]["targets"])
+
+        silenced = [a["target"] for _, a in actions.get("silence", [])]
+        if silenced:
+            self.exorcise(silenced[0])
+        elif self.exorcised_player is None:
+            # une nuit sans aucun exorcisme (ni action, ni admin) : plus de cible interdite
+            self.last_exorcised = None
+
+        self.last_protected = {j: a["target"] for j, a in actions.get("protect", [])}
+        protected = set(self.last_protected.values())
+
+        cursed, saved = [], []
+        for j, a in actions.get("relic", []):
+            self.relics_used.setdefault(j, []).append(a["relic"])
+            (saved if a["relic"] == "vie" else cursed).append(a["target"])
+
+        alive = set(self.joueurs) - self.eliminated_players
+        deaths = night_deaths(
+            alive,
+            demon_target(a["target"] for _, a in actions.get("kill", [])),
+            protected,
+            {j: a["target"] for j, a in actions.get("hide", [])},
+            self.couple_players,
+            cursed,
+            saved,
+        )
+        if deaths:
+            self.eliminated_players |= deaths
+            self.eliminated_version += 1
+
+        # rapport : morts de la nuit et éliminations du maître du jeu depuis le début de la nuit
+        dead = PlayerSet(self._index, bits=self.eliminated_players.bits & ~self.night_eliminated_bits)
+        names = ", ".join(f"Joueur {j}" for j in dead)
+        if not dead:
+            text = "Cette nuit, personne n'est mort."
+        elif len(dead) == 1:
+            text = f"Cette nuit, {names} est mort."
+        else:
+            text = f"Cette nuit, {names} sont morts."
+        self.push_admin_message("all", self.joueurs, text)
+        return deaths
+
+    def swap_roles(self, j1: str, j2: str):
+        ids, position = self.role_ids, self._index.position
+        i1, i2 = position[j1], position[j2]
+        ids[i1], ids[i2] = ids[i2], ids[i1]
+        self.roles_version += 1
+
+        # index : les deux joueurs changent de bitset quand leurs rôles diffèrent
+        if ids[i1] != ids[i2]:
+            moved = 1 << i1 | 1 << i2
+            self.role_players[ids[i1]] ^= moved
+            self.role_players[ids[i2]] ^= moved
+
+    # -------------------------------------------------
+    # SÉRIALISATION (backends de stockage partagés)
+    # -------------------------------------------------
+
+    # copie binaire (checkpoint.py) : l'index des joueurs est repris du cache partagé
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def to_dict(self) -> dict:
+        """État sérialisable en JSON ; les rôles sont des index dans base_roles."""
+        return {
+            "room_id": self.room_id,
+            "joueurs": list(self.joueurs),
+            "roles": self.role_indexes(),
+            **self.ledger.to_dict(),
+            "admin_started": self.admin_started,
+            "reveal_results": self.reveal_results,
+            "eliminated_players": sorted(self.eliminated_players),
+            "exorcised_player": self.exorcised_player,
+            "couple_players": sorted(self.couple_players),
+            "night_actions": self.night_actions,
+            "last_protected": self.last_protected,
+            "last_exorcised": self.last_exorcised,
+            "relics_used": self.relics_used,
+            "night_eliminated": sorted(PlayerSet(self._index, bits=self.night_eliminated_bits)),
+            "inspections": self.inspections,
+            "necro_messages": [m.to_dict() for m in self.necro_messages],
+            "necro_next_id": self.necro_next_id,
+            "admin_messages": self.admin_messages.to_dict(),
+            "version": self.version,
+            "roles_version": self.roles_version,
+            "eliminated_version": self.eliminated_version,
+            "couple_version": self.couple_version,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GameRoom":
+        room = cls.__new__(cls)
+        room.room_id = data["room_id"]
+        room._index = player_index(data["joueurs"])
+        room.role_ids = bytearray(data["roles"][j] for j in room.joueurs)
+        room._index_roles()
+        room.ledger = VoteLedger.from_dict(data)
+        room.admin_started = data["admin_started"]
+        room.reveal_results = data["reveal_results"]
+        room.eliminated_players = PlayerSet(room._index, data["eliminated_players"])
+        room.exorcised_player = data["exorcised_player"]
+        room.couple_players = PlayerSet(room._index, data["couple_players"])
+        room.night_actions = dict(data.get("night_actions", {}))
+        room.last_protected = dict(data.get("last_protected", {}))
+        room.last_exorcised = data.get("last_exorcised")
+        room.relics_used = {j: list(r) for j, r in data.get("relics_used", {}).items()}
+        room.night_eliminated_bits = PlayerSet(
+            room._index, data.get("night_eliminated", data["eliminated_players"])).bits
+        room.inspections = {j: tuple(seen) for j, seen in data.get("inspections", {}).items()}
+        room.necro_messages = [LastWill(**m) for m in data["necro_messages"]]
+        room.necro_next_id = data["necro_next_id"]
+        room.last_wills = {m.author: m for m in room.necro_messages}
+        room.admin_messages = AdminMessages.from_dict(room.joueurs, data["admin_messages"])
+        room.version = data["version"]
+        room.roles_version = data.get("roles_version", 0)
+        room.eliminated_version = data.get("eliminated_version", 0)
+        room.couple_version = data.get("couple_version", 0)
+        return room
+
+    # -------------------------------------------------
+    # RESET
+    # -------------------------------------------------
+
+    def reset_votes_only(self):
+        """
+        Remet les votes à zéro, permet de relancer un tour de vote
+        sans changer les rôles ni les joueurs éliminés.
+        """
+        self.ledger.reset()
+        self.reveal_results = False  # on cache les anciens résultats
+
+    def reset_all(self, roles=None):
+        """
+        Nouvelle partie complète : nouveaux rôles, plus aucun éliminé,
+        messages de morts effacés.
+        """
+        self.reset_votes_only()
+        self.eliminated_players.clear()
+        self.couple_players.clear()
+        self.eliminated_version += 1
+        self.couple_version += 1
+
+        self.necro_messages.clear()
+        self.necro_next_id = 1
+        self.last_wills.clear()
+        # ids toujours croissants : une page restée ouverte (?after=<ancien id>)
+        # reçoit aussi les messages de la nouvelle partie
+        self.admin_messages = AdminMessages(self.joueurs, self.admin_messages.next_id)
+
+        self.exorcised_player = None
+        self.admin_started = False
+        self.reveal_results = False
+
+        self.night_actions = {}
+        self.last_protected = {}
+        self.last_exorcised = None
+        self.relics_used = {}
+        self.night_eliminated_bits = 0
+        self.inspections = {}
+        self.assign_random_roles(roles)
+
+    def reset_round_keep_eliminated(self):
+        self.reset_votes_only()
+        self.admin_started = False
+        self.exorcised_player = None   # l’exorcisme ne dure qu’un tour
+        self.night_eliminated_bits = self.eliminated_players.bits
+        self.inspections = {}
@@ -0,0 +1,117 @@
+"""
+Déclinaisons des images de static/ (largeur + format) avec cache disque.
+
+Les PNG d'origine pèsent jusqu'à 1,7 Mo : les pages demandent via img_url()
+une version à la taille d'affichage (WebP par défaut). Chaque déclinaison est
+générée une fois puis servie depuis le cache, dont le nom contient l'empreinte
+du fichier source : remplacer une image invalide automatiquement ses déclinaisons.
+Le cache est borné en taille (les fichiers les moins récemment servis partent d'abord).
+"""
+import hashlib
+import os
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow optionnel : on sert alors les originaux
+    Image = None
+
+# Largeurs générées (une largeur demandée est arrondie à la suivante)
+WIDTHS = (48, 96, 160, 320, 640, 1280)
+
+# format d'URL -> (format Pillow, type MIME)
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+def fit_width(width: int) -> int:
+    for w in WIDTHS:
+        if w >= width:
+            return w
+    return WIDTHS[-1]
+
+
+class ImageDerivatives:
+
+    def __init__(self, static_dir: str, cache_dir: str, sources, max_bytes: int):
+        self.static_dir = static_dir
+        self.cache_dir = cache_dir
+        self.sources = set(sources)
+        self.max_bytes = max_bytes
+        self._hashes = {}      # nom -> (mtime, sha1)
+        self._cache_size = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    def source_hash(self, name: str) -> str:
+        src = os.path.join(self.static_dir, name)
+        mtime = os.stat(src).st_mtime_ns
+        known = self._hashes.get(name)
+        if known is None or known[0] != mtime:
+            with open(src, "rb") as fh:
+                known = self._hashes[name] = (mtime, hashlib.sha1(fh.read()).hexdigest())
+        return known[1]
+
+    def path(self, name: str, width: int, fmt: str) -> str:
+        """Chemin du fichier décliné (généré si absent)."""
+        width = fit_width(width)
+        stem = os.path.splitext(name)[0]
+        dst = os.path.join(self.cache_dir, f"{stem}-{self.source_hash(name)[:16]}-{width}.{fmt}")
+
+        if os.path.exists(dst):
+            os.utime(dst)  # "récemment servi" pour l'éviction
+            return dst
+
+        with self._lock:
+            if not os.path.exists(dst):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._render(os.path.join(self.static_dir, name), dst, width, fmt)
+                self._account(os.path.getsize(dst))
+        return dst
+
+    @staticmethod
+    def _render(src: str, dst: str, width: int, fmt: str):
+        pil_format = FORMATS[fmt][0]
+        with Image.open(src) as im:
+            if im.width > width:
+                height = round(im.height * width / im.width)
+                im = im.resize((width, height), Image.LANCZOS)
+            if pil_format == "JPEG" and im.mode != "RGB":
+                im = im.convert("RGB")
+
+            # écriture atomique : jamais de fichier à moitié écrit dans le cache
+            tmp = f"{dst}.{os.getpid()}.tmp"
+            options = {"quality": 82, "method": 4} if pil_format == "WEBP" else {"optimize": True}
+            im.save(tmp, pil_format, **options)
+        os.replace(tmp, dst)
+
+    def _account(self, added: int):
+        """Met à jour la taille du cache et évince au-delà de max_bytes (sous verrou)."""
+        if self._cache_size is None:
+            self._cache_size = sum(e.stat().st_size for e in os.scandir(self.cache_dir) if e.is_file())
+        else:
+            self._cache_size += added
+
+        if self._cache_size <= self.max_bytes:
+            return
+
+        entries = sorted(
+            (e for e in os.scandir(self.cache_dir) if e.is_file()),
+            key=lambda e: e.stat().st_mtime,
+        )
+        target = self.max_bytes * 0.9
+        for e in entries:
+            if self._cache_size <= target:
+                break
+            size = e.stat().st_size
+            try:
+                os.unlink(e.path)
+            except FileNotFoundError:
+                continue
+            self._cache_size -= size
@@ -0,0 +1,192 @@
+"""
+Métriques du processus au format texte Prometheus (servies sur /metrics).
+
+Compteurs, jauges et histogrammes minimalistes, sans dépendance : une mesure
+coûte un verrou et une recherche dichotomique dans les bornes de l'histogramme,
+assez peu pour rester activé en production. Les jauges calculées à la lecture
+(tables actives, messages en attente...) passent par une fonction appelée
+seulement au moment du scrape.
+
+Chaque worker gunicorn a ses propres compteurs : le scrape voit le worker qui
+a répondu (son pid est rappelé en tête de la réponse).
+"""
+import bisect
+import os
+import threading
+import time
+
+# Bornes par défaut (secondes), plus fines que celles de Prometheus vers le bas
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, help_: str, labels=()):
+        self.name = name
+        self.help = help_
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_, labels=()):
+        super().__init__(name, help_, labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        for labels, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(v)}")
+        return lines
+
+
+class Gauge(Metric):
+    """Valeur posée par set()/inc()/dec(), ou lue à chaque scrape via `read`."""
+    kind = "gauge"
+
+    def __init__(self, name, help_, labels=(), read=None):
+        super().__init__(name, help_, labels)
+        self._values = {}
+        self.read = read   # () -> valeur, ou {étiquettes: valeur}
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        values = self._values
+        if self.read is not None:
+            v = self.read()
+            values = v if isinstance(v, dict) else {(): v}
+        lines = self.header()
+        for labels, v in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(v)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # étiquettes -> [compte par borne (+Inf inclus), somme]
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        """Context manager : observe la durée du bloc."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self.header()
+        names = self.label_names + ("le",)
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "t0")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0, *self.labels)
+
+
+class RecentSet:
+    """Clés vues pendant les `window` dernières secondes (ex. clients qui pollent)."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._seen = {}
+
+    def add(self, key):
+        self._seen[key] = time.monotonic()
+
+    def __len__(self):
+        limit = time.monotonic() - self.window
+        # purge à la lecture : add() reste une simple affectation
+        for key, t in list(self._seen.items()):
+            if t < limit:
+                self._seen.pop(key, None)
+        return len(self._seen)
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = [f"# pid {os.getpid()}"]
+        for m in self.metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
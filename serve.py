@@ -0,0 +1,119 @@
+"""
+Lancement en production (gunicorn), à la place du serveur de développement :
+
+    python serve.py                                  # gevent, 1 worker, port 8000
+    python serve.py --worker-class eventlet --worker-connections 5000
+    STATE_BACKEND=sqlite python serve.py --worker-class sync --workers 4 --threads 8
+
+Workers asynchrones (gevent, eventlet) : une connexion inactive (long-poll, flux
+SSE, socket) ne coûte qu'une greenlet, un worker en tient des milliers. Workers
+synchrones : une connexion retenue occupe un thread, à réserver aux tables
+pollées sans attente.
+
+L'application est chargée dans chaque worker, après le monkey-patching de
+gevent / eventlet, par create_app() : tables restaurées et templates compilés
+avant la première requête (bytecode relu depuis TEMPLATE_CACHE_DIR quand un
+worker précédent l'a déjà écrit).
+SIGTERM (redéploiement) : le worker n'accepte plus de connexions, relâche
+celles qui sont retenues (drain() dans app.py) puis termine les requêtes en
+cours pendant au plus --graceful-timeout secondes.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+WORKER_CLASSES = {
+    "sync": ("sync", "threading"),
+    "gevent": ("gevent", "gevent"),
+    "eventlet": ("eventlet", "eventlet"),
+}
+
+
+def default_worker_class() -> str:
+    for name in ("gevent", "eventlet"):
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return "sync"
+
+
+def raise_fd_limit():
+    """Une connexion = un descripteur : limite souple portée à la limite dure."""
+    try:
+        import resource
+    except ImportError:
+        return  # Windows
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+class Server(BaseApplication):
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import create_app
+        return create_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur de production (gunicorn)")
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:8000"))
+    parser.add_argument("--worker-class", choices=sorted(WORKER_CLASSES), default=default_worker_class())
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)))
+    parser.add_argument("--threads", type=int, default=1, help="threads par worker (sync seulement)")
+    parser.add_argument("--worker-connections", type=int, default=2000,
+                        help="connexions simultanées par worker (gevent / eventlet)")
+    parser.add_argument("--keepalive", type=int, default=15, help="secondes d'attente d'une requête keep-alive")
+    parser.add_argument("--graceful-timeout", type=int, default=20)
+    parser.add_argument("--timeout", type=int, default=60,
+                        help="worker sans nouvelles tué après ce délai (> durée max d'un long-poll)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    worker_class, async_mode = WORKER_CLASSES[args.worker_class]
+
+    # Chaque worker a ses tables en mémoire : plusieurs workers doivent partager un backend
+    if args.workers > 1 and os.environ.get("STATE_BACKEND", "memory") == "memory":
+        parser.error("plusieurs workers demandent STATE_BACKEND=sqlite (ou socket)")
+    if args.workers > 1 and args.worker_class != "sync" and not os.environ.get("SOCKETIO_MESSAGE_QUEUE"):
+        print("attention : sans SOCKETIO_MESSAGE_QUEUE, un événement Socket.IO ne part que "
+              "du worker qui l'émet (et les sockets demandent des sessions collantes)", file=sys.stderr)
+
+    # lu par app.py à l'import, dans chaque worker
+    os.environ.setdefault("SOCKETIO_ASYNC_MODE", async_mode)
+    raise_fd_limit()
+
+    options = {
+        "bind": args.bind,
+        "worker_class": worker_class,
+        "workers": args.workers,
+        "keepalive": args.keepalive,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": args.timeout,
+        "loglevel": args.log_level,
+        "accesslog": "-",
+        "preload_app": False,  # import après le monkey-patching, dans chaque worker
+    }
+    if args.worker_class == "sync":
+        options["threads"] = args.threads  # > 1 : worker gthread
+    else:
+        options["worker_connections"] = args.worker_connections
+
+    Server(options).run()
+
+
+if __name__ == "__main__":
+    main()
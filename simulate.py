@@ -0,0 +1,320 @@
+"""
+Simulation de parties sans HTTP (Monte Carlo), pour équilibrer les paquets de rôles.
+
+Les parties sont jouées par des bots (stratégies interchangeables) avec les
+règles de game.py : morts de la nuit par night_deaths(), dépouillement de
+day_victims() (un seul joueur en tête meurt, égalité = personne, l'amoureux
+suit dans la tombe), joueur exorcisé privé de vote pour la journée, échange de
+cartes de l'Esprit farceur (une fois par partie).
+
+La nuit est réduite aux pouvoirs qui changent l'issue d'une partie :
+- les Démons tuent un joueur du camp adverse ;
+- chaque Rédempteur protège un joueur différent chaque nuit ;
+- l'Amant maudit lie deux joueurs (un nouveau couple si le sien est mort) ;
+- l'Exorciste réduit un joueur au silence (jamais deux nuits de suite) ;
+- chaque Cartomancienne découvre le camp d'un joueur (utilisé par la stratégie "village").
+Les autres rôles jouent comme de simples villageois. Comme à une vraie table,
+les grands paquets (build_deck) comptent plusieurs Rédempteurs et
+Cartomanciennes, qui agissent tous ; les rôles uniques de game.py
+(UNIQUE_ROLES) ne peuvent pas être en double dans un paquet.
+
+Victoire des Bienfaiteurs quand il n'y a plus de Démon, des Malfaiteurs quand
+ils sont au moins aussi nombreux que les autres ; partie nulle après
+--max-rounds tours.
+
+Les parties sont réparties par lots sur tous les cœurs (process pool) ; dans
+un lot, les votes d'une journée sont tirés d'un seul appel (random.choices)
+puis comptés par Counter.
+
+    python simulate.py --players 8 12 20 --games 1000000
+    python simulate.py --deck "Démon*3,Enchanteresse,Rédempteur,Froussard,Sans visage" --strategy village
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from game import (
+    CAMP_EVIL, CAMP_GOOD, ROLE_BY_NAME, UNIQUE_ROLES, build_deck, day_victims, night_deaths, winning_camp,
+)
+
+GOOD = CAMP_GOOD
+EVIL = CAMP_EVIL
+DRAW = "nulle"
+
+EVIL_ROLES = frozenset(name for name, r in ROLE_BY_NAME.items() if r["camp"] == EVIL)
+
+# Parties par tâche envoyée à un processus
+BATCH_SIZE = 5000
+
+
+class Table:
+    """État d'une partie simulée : joueurs 0..n-1, cartes échangeables (Esprit farceur)."""
+
+    __slots__ = ("roles", "evil", "alive", "couple", "exorcised", "last_exorcised",
+                 "last_protected", "swap_used", "night", "seen")
+
+    def __init__(self, deck, rng):
+        self.roles = list(deck)
+        rng.shuffle(self.roles)
+        self.evil = {p for p, role in enumerate(self.roles) if role in EVIL_ROLES}
+        self.alive = set(range(len(self.roles)))
+        self.couple = set()
+        self.exorcised = None
+        self.last_exorcised = None
+        self.last_protected = {}   # Rédempteur -> protégé de la nuit précédente
+        self.swap_used = False
+        self.night = 0
+        self.seen = {}      # Cartomancienne : joueur -> camp découvert
+
+    def holder(self, role: str):
+        """Joueur vivant qui porte la carte `role` (rôles uniques), ou None."""
+        for p in self.alive:
+            if self.roles[p] == role:
+                return p
+        return None
+
+    def holders(self, role: str):
+        """Joueurs vivants qui portent la carte `role`, dans l'ordre de la table."""
+        return [p for p in sorted(self.alive) if self.roles[p] == role]
+
+    def is_evil(self, p: int) -> bool:
+        return p in self.evil
+
+    def swap(self, p1: int, p2: int):
+        roles = self.roles
+        roles[p1], roles[p2] = roles[p2], roles[p1]
+        self.evil = (self.evil - {p1, p2}) | {p for p in (p1, p2) if roles[p] in EVIL_ROLES}
+
+    def winner(self):
+        return winning_camp(len(self.alive), len(self.evil & self.alive))
+
+
+# -----------------------------------------------------
+# STRATÉGIES DES BOTS
+# -----------------------------------------------------
+
+class RandomBots:
+    """Décisions au hasard ; les Démons ne tuent que dans l'autre camp."""
+
+    swap_chance = 0.5   # probabilité que l'Esprit farceur utilise son échange, chaque nuit
+
+    def swap(self, t: Table, farceur: int, rng):
+        if rng.random() < self.swap_chance:
+            return rng.choice([p for p in t.alive if p != farceur])
+        return None
+
+    def couple(self, t: Table, rng):
+        return rng.sample(sorted(t.alive), 2)
+
+    def exorcise(self, t: Table, rng):
+        return rng.choice([p for p in t.alive if p != t.last_exorcised])
+
+    def protect(self, t: Table, redempteur: int, rng):
+        last = t.last_protected.get(redempteur)
+        return rng.choice([p for p in t.alive if p != last])
+
+    def inspect(self, t: Table, seer: int, rng):
+        unknown = [p for p in t.alive if p != seer and p not in t.seen]
+        return rng.choice(unknown) if unknown else None
+
+    def night_kill(self, t: Table, rng):
+        return rng.choice(sorted(t.alive - t.evil))
+
+    def votes(self, t: Table, voters, rng):
+        """Cibles des votants (un vote chacun, jamais pour soi) : un seul tirage pour tous."""
+        alive = sorted(t.alive)
+        index = {p: i for i, p in enumerate(alive)}
+        picks = rng.choices(range(len(alive) - 1), k=len(voters))
+        # décalage : l'indice du votant lui-même est sauté
+        return [alive[k + (k >= index[v])] for v, k in zip(voters, picks)]
+
+
+class CoordinatedDemons(RandomBots):
+    """Les Démons votent ensemble contre un même joueur de l'autre camp."""
+
+    def votes(self, t: Table, voters, rng):
+        targets = super().votes(t, voters, rng)
+        good = sorted(t.alive - t.evil)
+        victim = rng.choice(good)
+        evil = t.evil
+        return [victim if v in evil else target for v, target in zip(voters, targets)]
+
+
+class Village(CoordinatedDemons):
+    """Démons coordonnés ; le village suit la Cartomancienne quand elle a trouvé un Démon."""
+
+    def votes(self, t: Table, voters, rng):
+        targets = super().votes(t, voters, rng)
+        if not t.holders("Cartomancienne"):
+            return targets
+        accused = next((p for p, camp in t.seen.items() if camp == EVIL and p in t.alive), None)
+        if accused is None:
+            return targets
+        evil = t.evil
+        return [target if v in evil or v == accused else accused for v, target in zip(voters, targets)]
+
+
+STRATEGIES = {
+    "random": RandomBots,
+    "demons": CoordinatedDemons,
+    "village": Village,
+}
+
+
+# -----------------------------------------------------
+# MOTEUR
+# -----------------------------------------------------
+
+def play_night(t: Table, bots, rng):
+    t.night += 1
+
+    farceur = t.holder("Esprit farceur")
+    if farceur is not None and not t.swap_used:
+        other = bots.swap(t, farceur, rng)
+        if other is not None:
+            t.swap(farceur, other)
+            t.swap_used = True
+
+    if (not t.couple or not t.couple & t.alive) and t.holder("Amant maudit") is not None and len(t.alive) >= 2:
+        t.couple = set(bots.couple(t, rng))
+
+    t.exorcised = None
+    if t.holder("Exorciste") is not None:
+        t.exorcised = t.last_exorcised = bots.exorcise(t, rng)
+
+    for seer in t.holders("Cartomancienne"):
+        p = bots.inspect(t, seer, rng)
+        if p is not None:
+            t.seen[p] = EVIL if t.is_evil(p) else GOOD
+
+    t.last_protected = {r: bots.protect(t, r, rng) for r in t.holders("Rédempteur")}
+
+    victim = bots.night_kill(t, rng)
+    t.alive -= night_deaths(t.alive, victim, set(t.last_protected.values()), {}, t.couple)
+
+
+def play_day(t: Table, bots, rng):
+    voters = [p for p in t.alive if p != t.exorcised]
+    if not voters or len(t.alive) < 2:
+        return
+    tally = Counter(bots.votes(t, voters, rng))
+    max_votes = max(tally.values())
+    leaders = [p for p, n in tally.items() if n == max_votes]
+    for p in day_victims(max_votes, leaders, t.couple):
+        t.alive.discard(p)
+
+
+def play(deck, bots, rng, max_rounds: int = 50):
+    """(camp gagnant ou DRAW, nombre de tours) d'une partie."""
+    t = Table(deck, rng)
+    for round_ in range(1, max_rounds + 1):
+        play_night(t, bots, rng)
+        winner = t.winner()
+        if winner is None:
+            play_day(t, bots, rng)
+            winner = t.winner()
+        if winner is not None:
+            return winner, round_
+    return DRAW, max_rounds
+
+
+def run_batch(deck, strategy: str, games: int, seed: int, max_rounds: int):
+    """Lot de parties (exécuté dans un processus) : (résultats par camp, total des tours)."""
+    rng = random.Random(seed)
+    bots = STRATEGIES[strategy]()
+    results = Counter()
+    rounds = 0
+    for _ in range(games):
+        winner, n = play(deck, bots, rng, max_rounds)
+        results[winner] += 1
+        rounds += n
+    return results, rounds
+
+
+def check_deck(deck):
+    """ValueError si le paquet contient en double un rôle que la table ne gère qu'une fois."""
+    counts = Counter(deck)
+    doubles = [name for name in UNIQUE_ROLES if counts[name] > 1]
+    if doubles:
+        raise ValueError(f"Rôles uniques en double : {', '.join(doubles)}")
+
+
+def simulate(deck, strategy: str = "random", games: int = 100_000, seed: int = 0,
+             max_rounds: int = 50, pool: ProcessPoolExecutor = None):
+    """Joue `games` parties du paquet `deck` (noms de rôles), réparties sur `pool`."""
+    check_deck(deck)
+    batches = [min(BATCH_SIZE, games - start) for start in range(0, games, BATCH_SIZE)]
+    args = [(deck, strategy, n, seed * 1_000_003 + i, max_rounds) for i, n in enumerate(batches)]
+    if pool is None:
+        outputs = [run_batch(*a) for a in args]
+    else:
+        outputs = pool.map(run_batch, *zip(*args))
+
+    results = Counter()
+    rounds = 0
+    for r, n in outputs:
+        results.update(r)
+        rounds += n
+    return {"games": games, "results": results, "avg_rounds": rounds / games if games else 0}
+
+
+# -----------------------------------------------------
+# LIGNE DE COMMANDE
+# -----------------------------------------------------
+
+def parse_deck(spec: str):
+    """"Démon*3,Enchanteresse,..." -> liste de noms de rôles."""
+    deck = []
+    for part in spec.split(","):
+        name, _, count = part.strip().partition("*")
+        name = name.strip()
+        if name not in ROLE_BY_NAME:
+            raise argparse.ArgumentTypeError(f"Rôle inconnu : {name!r}")
+        deck += [name] * int(count or 1)
+    try:
+        check_deck(deck)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return deck
+
+
+def deck_label(deck) -> str:
+    counts = Counter(deck)
+    return f"{len(deck)} joueurs ({counts.get('Démon', 0)} Démons)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation Monte Carlo des paquets de rôles")
+    parser.add_argument("--players", type=int, nargs="*", default=[],
+                        help="tailles de table (paquet généré par build_deck)")
+    parser.add_argument("--deck", type=parse_deck, action="append", default=[],
+                        help='paquet explicite, ex. "Démon*3,Enchanteresse,Rédempteur"')
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), nargs="*", default=["random"])
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--max-rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    decks = [[r["name"] for r in build_deck(n)] for n in args.players] + args.deck
+    if not decks:
+        decks = [[r["name"] for r in build_deck(12)]]
+
+    print(f"{'paquet':<26}{'stratégie':<10}{'parties':>10}{'Bienfaiteurs':>14}"
+          f"{'Malfaiteurs':>13}{'nulles':>8}{'tours':>7}{'s':>7}")
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        for deck in decks:
+            for strategy in args.strategy:
+                t0 = time.perf_counter()
+                out = simulate(deck, strategy, args.games, args.seed, args.max_rounds, pool)
+                r, n = out["results"], out["games"]
+                print(f"{deck_label(deck):<26}{strategy:<10}{n:>10}{r[GOOD] / n:>14.1%}"
+                      f"{r[EVIL] / n:>13.1%}{r[DRAW] / n:>8.1%}{out['avg_rounds']:>7.1f}"
+                      f"{time.perf_counter() - t0:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Cache des vues JSON sérialisées (statut joueur, spectateur, admin).
+
+Chaque vue est sérialisée une seule fois par version de la table, puis les
+mêmes octets (et leur copie gzip) sont servis à tous les clients qui pollent
+jusqu'à la prochaine modification. bump_state() vide les vues de la table ;
+la version stockée protège aussi des modifications faites par un autre worker.
+
+PatchHistory garde les dernières versions de chaque vue pour répondre à
+?from=<version> par un patch (JSON Merge Patch, RFC 7386) au lieu de la vue
+complète.
+"""
+import gzip
+import json
+import threading
+from collections import OrderedDict
+
+# En dessous, la compression coûte plus qu'elle ne rapporte
+GZIP_MIN_SIZE = 512
+
+
+class Snapshot:
+    __slots__ = ("version", "body", "gzipped")
+
+    def __init__(self, version: int, body: bytes):
+        self.version = version
+        self.body = body
+        self.gzipped = gzip.compress(body, 6) if len(body) >= GZIP_MIN_SIZE else None
+
+
+class SnapshotCache:
+    """room_id -> {(vue, argument): Snapshot}"""
+
+    def __init__(self):
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def get(self, room_id: str, key, version: int, build) -> Snapshot:
+        """Snapshot de la vue `key` à `version` ; build() -> bytes si absent ou périmé."""
+        views = self._rooms.get(room_id)
+        snap = views.get(key) if views else None
+        if snap is not None and snap.version == version:
+            return snap
+
+        # deux requêtes simultanées peuvent sérialiser en double : sans gravité
+        snap = Snapshot(version, build())
+        with self._lock:
+            self._rooms.setdefault(room_id, {})[key] = snap
+        return snap
+
+    def invalidate(self, room_id: str):
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+
+class FragmentCache:
+    """
+    room_id -> {nom: (clé, html)} : fragments HTML rendus une fois par état.
+
+    La clé est un tuple de sous-versions de la table (rôles, éliminés, votes...) :
+    un fragment n'est re-rendu que si une des parties qu'il affiche a changé,
+    pas à chaque bump_state() (qui ne le vide donc pas).
+    """
+
+    def __init__(self):
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def get(self, room_id: str, name: str, key, render):
+        """HTML du fragment `name` pour `key` ; render() si absent ou périmé."""
+        entries = self._rooms.get(room_id)
+        entry = entries.get(name) if entries else None
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        html = render()
+        with self._lock:
+            self._rooms.setdefault(room_id, {})[name] = (key, html)
+        return html
+
+
+_MISSING = object()
+
+
+def merge_patch(old: dict, new: dict) -> dict:
+    """
+    Patch (RFC 7386) qui transforme `old` en `new` : clés modifiées seulement,
+    récursivement pour les objets ; null supprime une clé, les listes sont remplacées.
+    """
+    patch = {}
+    for k, v in new.items():
+        o = old.get(k, _MISSING)
+        if o == v:
+            continue
+        if isinstance(v, dict) and isinstance(o, dict):
+            patch[k] = merge_patch(o, v)
+        else:
+            patch[k] = v
+    for k in old.keys() - new.keys():
+        patch[k] = None
+    return patch
+
+
+class PatchHistory:
+    """
+    room_id -> {clé de vue: {version: vue décodée}}, les `size` dernières versions.
+
+    Les vues sont relues depuis leurs octets JSON : l'historique contient
+    exactement ce que les clients ont reçu (et ne partage rien avec la table).
+    """
+
+    def __init__(self, size: int = 16):
+        self.size = size
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def record(self, room_id: str, key, version: int, body: bytes):
+        with self._lock:
+            ring = self._rooms.setdefault(room_id, {}).setdefault(key, OrderedDict())
+            ring[version] = json.loads(body)
+            while len(ring) > self.size:
+                ring.popitem(last=False)
+
+    def patch(self, room_id: str, key, since: int, version: int):
+        """Patch de `since` à `version`, ou None si une des deux versions n'est plus connue."""
+        ring = self._rooms.get(room_id, {}).get(key)
+        if not ring:
+            return None
+        old, new = ring.get(since), ring.get(version)
+        if old is None or new is None:
+            return None
+        patch = merge_patch(old, new)
+        patch.pop("version", None)
+        return {"from": since, "version": version, "patch": patch}
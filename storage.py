@@ -0,0 +1,361 @@
+"""
+Stockage des tables (GameRoom), choisi par la variable STATE_BACKEND :
+
+- memory : état dans le processus (comportement historique, un seul worker)
+- sqlite : fichier SQLite en mode WAL, partagé par tous les workers gunicorn
+- socket : processus de stockage local (`python storage.py serve`) joint par socket Unix
+
+Lecture : rooms.get(room_id) renvoie une GameRoom à ne pas modifier.
+Écriture : toujours dans `with rooms.transaction(room_id) as room:` ; la
+modification est atomique (verrou de table) et enregistrée à la sortie du bloc.
+"""
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from game import GameRoom, ROOM_ID_RE
+
+
+class RoomStore(ABC):
+    """Interface commune aux backends (un backend incomplet ne peut pas être instancié)."""
+
+    @abstractmethod
+    def get(self, room_id: str):
+        """GameRoom en lecture seule, ou None si la table n'existe pas."""
+
+    @abstractmethod
+    def create(self, room_id: str, joueurs=None) -> GameRoom:
+        """Crée la table si besoin (joueurs : DEFAULT_JOUEURS par défaut) et la renvoie."""
+
+    @abstractmethod
+    def transaction(self, room_id: str):
+        """Context manager : GameRoom modifiable, enregistrée atomiquement."""
+
+    @abstractmethod
+    def version(self, room_id: str) -> int:
+        """Version courante (lecture rapide, utilisée par le long-poll)."""
+
+    @abstractmethod
+    def room_ids(self):
+        """Identifiants de toutes les tables."""
+
+    def __contains__(self, room_id):
+        return self.get(room_id) is not None
+
+    def __len__(self):
+        return len(self.room_ids())
+
+    @staticmethod
+    def check_room_id(room_id: str):
+        if not ROOM_ID_RE.match(room_id):
+            raise ValueError(f"Identifiant de table invalide : {room_id!r}")
+
+
+# -----------------------------------------------------
+# MÉMOIRE (un seul processus)
+# -----------------------------------------------------
+
+class MemoryStore(RoomStore):
+    """Tables du processus, indexées par identifiant (accès O(1))."""
+
+    def __init__(self):
+        self._rooms = {}
+        self._locks = {}
+        self._create_lock = threading.Lock()
+
+    def get(self, room_id):
+        return self._rooms.get(room_id)
+
+    def create(self, room_id, joueurs=None):
+        self.check_room_id(room_id)
+        with self._create_lock:
+            room = self._rooms.get(room_id)
+            if room is None:
+                room = self._rooms[room_id] = GameRoom(room_id, joueurs)
+                self._locks[room_id] = threading.RLock()
+        return room
+
+    @contextmanager
+    def transaction(self, room_id):
+        room = self._rooms[room_id]
+        with self._locks[room_id]:
+            yield room
+
+    def version(self, room_id):
+        room = self._rooms.get(room_id)
+        return room.version if room else 0
+
+    def room_ids(self):
+        return list(self._rooms)
+
+    def put(self, room):
+        """Installe une table déjà construite (restauration au démarrage)."""
+        self._rooms[room.room_id] = room
+        self._locks.setdefault(room.room_id, threading.RLock())
+
+    def remove(self, room_id):
+        self._rooms.pop(room_id, None)
+        self._locks.pop(room_id, None)
+
+
+# -----------------------------------------------------
+# SQLITE (WAL, multi-processus)
+# -----------------------------------------------------
+
+class SQLiteStore(RoomStore):
+    """
+    Une ligne par table : (room_id, version, state JSON).
+    Les lectures ne désérialisent l'état que si la version a changé.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._cache = {}  # room_id -> GameRoom (dernière version lue)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rooms ("
+            " room_id TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " state TEXT NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, room_id, version, state):
+        cached = self._cache.get(room_id)
+        if cached is not None and cached.version == version:
+            return cached
+        room = GameRoom.from_dict(json.loads(state))
+        self._cache[room_id] = room
+        return room
+
+    def get(self, room_id):
+        conn = self._conn()
+        row = conn.execute("SELECT version FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        if row is None:
+            return None
+        cached = self._cache.get(room_id)
+        if cached is not None and cached.version == row[0]:
+            return cached
+        row = conn.execute("SELECT version, state FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        return self._load(room_id, *row)
+
+    def create(self, room_id, joueurs=None):
+        self.check_room_id(room_id)
+        room = GameRoom(room_id, joueurs)
+        self._conn().execute(
+            "INSERT OR IGNORE INTO rooms (room_id, version, state) VALUES (?, ?, ?)",
+            (room_id, room.version, json.dumps(room.to_dict())),
+        )
+        return self.get(room_id)
+
+    @contextmanager
+    def transaction(self, room_id):
+        conn = self._conn()
+        # BEGIN IMMEDIATE : prend le verrou d'écriture tout de suite
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+            if row is None:
+                raise KeyError(room_id)
+            room = GameRoom.from_dict(json.loads(row[0]))
+            yield room
+            conn.execute(
+                "UPDATE rooms SET version = ?, state = ? WHERE room_id = ?",
+                (room.version, json.dumps(room.to_dict()), room_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._cache[room_id] = room
+
+    def version(self, room_id):
+        row = self._conn().execute("SELECT version FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        return row[0] if row else 0
+
+    def room_ids(self):
+        return [r[0] for r in self._conn().execute("SELECT room_id FROM rooms")]
+
+
+# -----------------------------------------------------
+# PROCESSUS DE STOCKAGE LOCAL (socket Unix)
+# -----------------------------------------------------
+# Protocole : une requête JSON par ligne, une réponse JSON par ligne.
+#   {"op": "get", "room": id, "version": v}  -> {"version": v, "state": {...} | null}
+#   {"op": "create", "room": id, "state": {...}}
+#   {"op": "lock", "room": id}                -> {"version": v, "state": {...}}
+#   {"op": "put", "room": id, "state": {...}} -> enregistre et relâche le verrou
+#   {"op": "unlock", "room": id}
+#   {"op": "version", "room": id} / {"op": "list"}
+# Les verrous appartiennent à la connexion : ils sont relâchés si le client disparaît.
+
+class _StoreState:
+    def __init__(self):
+        self.rooms = {}   # room_id -> (version, state dict)
+        self.locks = {}   # room_id -> threading.Lock
+        self.mutex = threading.Lock()
+
+    def lock_for(self, room_id):
+        with self.mutex:
+            return self.locks.setdefault(room_id, threading.Lock())
+
+
+class _StoreHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        store = self.server.store
+        held = set()
+        try:
+            for line in self.rfile:
+                req = json.loads(line)
+                op, room_id = req["op"], req.get("room")
+                resp = {}
+
+                if op == "get":
+                    version, state = store.rooms.get(room_id, (None, None))
+                    resp = {"version": version}
+                    if version is not None and version != req.get("version"):
+                        resp["state"] = state
+
+                elif op == "create":
+                    with store.mutex:
+                        if room_id not in store.rooms:
+                            store.rooms[room_id] = (req["state"]["version"], req["state"])
+
+                elif op == "lock":
+                    store.lock_for(room_id).acquire()
+                    held.add(room_id)
+                    version, state = store.rooms.get(room_id, (None, None))
+                    resp = {"version": version, "state": state}
+
+                elif op == "put":
+                    store.rooms[room_id] = (req["state"]["version"], req["state"])
+                    held.discard(room_id)
+                    store.lock_for(room_id).release()
+
+                elif op == "unlock":
+                    held.discard(room_id)
+                    store.lock_for(room_id).release()
+
+                elif op == "version":
+                    resp = {"version": store.rooms.get(room_id, (0, None))[0]}
+
+                elif op == "list":
+                    resp = {"rooms": list(store.rooms)}
+
+                self.wfile.write(json.dumps(resp).encode() + b"\n")
+        finally:
+            for room_id in held:
+                store.lock_for(room_id).release()
+
+
+class _StoreServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path: str):
+    """Lance le processus de stockage (bloquant)."""
+    if os.path.exists(path):
+        os.unlink(path)
+    server = _StoreServer(path, _StoreHandler)
+    server.store = _StoreState()
+    print(f"Stockage des tables sur {path}")
+    server.serve_forever()
+
+
+class SocketStore(RoomStore):
+    """Client du processus de stockage ; une connexion par thread / greenlet."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._cache = {}
+
+    def _call(self, **req):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+        sock, reader = conn
+        sock.sendall(json.dumps(req).encode() + b"\n")
+        line = reader.readline()
+        if not line:
+            self._local.conn = None
+            raise ConnectionError("processus de stockage injoignable")
+        return json.loads(line)
+
+    def get(self, room_id):
+        cached = self._cache.get(room_id)
+        resp = self._call(op="get", room=room_id, version=cached.version if cached else None)
+        if resp["version"] is None:
+            return None
+        if "state" in resp:
+            cached = self._cache[room_id] = GameRoom.from_dict(resp["state"])
+        return cached
+
+    def create(self, room_id, joueurs=None):
+        self.check_room_id(room_id)
+        self._call(op="create", room=room_id, state=GameRoom(room_id, joueurs).to_dict())
+        return self.get(room_id)
+
+    @contextmanager
+    def transaction(self, room_id):
+        resp = self._call(op="lock", room=room_id)
+        if resp["state"] is None:
+            self._call(op="unlock", room=room_id)
+            raise KeyError(room_id)
+        room = GameRoom.from_dict(resp["state"])
+        try:
+            yield room
+        except BaseException:
+            self._call(op="unlock", room=room_id)
+            raise
+        self._call(op="put", room=room_id, state=room.to_dict())
+        self._cache[room_id] = room
+
+    def version(self, room_id):
+        return self._call(op="version", room=room_id)["version"]
+
+    def room_ids(self):
+        return self._call(op="list")["rooms"]
+
+
+# -----------------------------------------------------
+# CHOIX DU BACKEND
+# -----------------------------------------------------
+
+def open_store(backend: str = None) -> RoomStore:
+    """Backend désigné par STATE_BACKEND (memory par défaut)."""
+    backend = backend or os.environ.get("STATE_BACKEND", "memory")
+
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return SQLiteStore(os.environ.get("STATE_SQLITE_PATH", "mgpr_state.db"))
+    if backend == "socket":
+        return SocketStore(os.environ.get("STATE_SOCKET", "/tmp/mgpr-state.sock"))
+
+    raise ValueError(f"STATE_BACKEND inconnu : {backend!r}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "serve":
+        serve(sys.argv[2] if len(sys.argv) > 2 else os.environ.get("STATE_SOCKET", "/tmp/mgpr-state.sock"))
+    else:
+        print("usage: python storage.py serve [chemin_socket]")
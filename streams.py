@@ -0,0 +1,141 @@
+"""
+Flux Server-Sent Events (SSE) : une vue JSON poussée à chaque changement de table.
+
+Un seul producteur par table (tâche de fond lancée au premier abonné, arrêtée
+après le dernier) surveille la version de la table. À chaque changement, il
+encode la vue une fois par argument (page...) et par version de départ : un
+nouvel abonné reçoit la vue complète, les suivants un patch depuis la version
+qu'ils ont déjà. Les mêmes octets sont déposés dans la file de chaque abonné.
+Les files sont bornées : un client trop lent perd les états intermédiaires
+(il reçoit alors la vue complète), jamais le dernier. Sans changement, un commentaire
+SSE (heartbeat) est envoyé régulièrement pour garder la connexion ouverte
+derrière les proxies et détecter les clients partis.
+
+Les primitives (tâche de fond, sommeil, files) viennent de Socket.IO : le même
+code tourne en threads, sous gevent ou sous eventlet. Chaque abonné occupe une
+connexion pendant toute sa durée : à servir avec les workers gevent/eventlet
+(ou le serveur de dev), pas avec des workers gunicorn synchrones.
+"""
+import threading
+
+HEARTBEAT = b": ping\n\n"
+
+
+class _Subscriber:
+    __slots__ = ("key", "queue", "version")
+
+    def __init__(self, key, queue):
+        self.key = key
+        self.queue = queue
+        self.version = None  # dernière version déposée dans la file
+
+
+class StreamHub:
+    """
+    room_id -> abonnés, avec un producteur par table.
+
+    version(room_id) -> int (lecture rapide) ;
+    encode(room_id, key, base) -> (version, événement, octets JSON) de la vue `key`,
+    complète si base vaut None, sinon de préférence un patch depuis `base`.
+    """
+
+    def __init__(self, socketio, version, encode, poll: float = 0.2, heartbeat: float = 15,
+                 queue_size: int = 4, retry_ms: int = 2000):
+        self.socketio = socketio
+        self.version = version
+        self.encode = encode
+        self.poll = poll
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self.retry_ms = retry_ms
+
+        self._rooms = {}        # room_id -> [Subscriber]
+        self._producers = set()
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._rooms.values())
+
+    def subscribe(self, room_id: str, key=None):
+        """Générateur de chunks SSE pour un abonné à la vue `key` de la table."""
+        eio = self.socketio.server.eio
+        sub = _Subscriber(key, eio.create_queue(maxsize=self.queue_size))
+        empty = eio.get_queue_empty_exception()
+
+        with self._lock:
+            self._rooms.setdefault(room_id, []).append(sub)
+            start = room_id not in self._producers
+            self._producers.add(room_id)
+        if start:
+            self.socketio.start_background_task(self._produce, room_id)
+
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            while not self.closed:
+                try:
+                    chunk = sub.queue.get(timeout=self.heartbeat)
+                except empty:
+                    chunk = HEARTBEAT
+                if chunk is None:
+                    return  # close() : fin du flux
+                yield chunk
+        finally:
+            # client parti (écriture échouée) ou serveur arrêté
+            with self._lock:
+                subs = self._rooms.get(room_id)
+                if subs is not None and sub in subs:
+                    subs.remove(sub)
+                    if not subs:
+                        del self._rooms[room_id]
+
+    def close(self):
+        """Termine tous les flux (arrêt du worker) ; les clients se reconnecteront ailleurs."""
+        self.closed = True
+        empty = self.socketio.server.eio.get_queue_empty_exception()
+        with self._lock:
+            subs = [sub for room_subs in self._rooms.values() for sub in room_subs]
+        for sub in subs:
+            try:
+                while True:
+                    sub.queue.get_nowait()
+            except empty:
+                sub.queue.put_nowait(None)
+
+    def _produce(self, room_id: str):
+        while True:
+            with self._lock:
+                subs = self._rooms.get(room_id)
+                if not subs or self.closed:
+                    self._producers.discard(room_id)
+                    return
+                subs = list(subs)
+
+            version = self.version(room_id)
+            if version is not None and any(s.version != version for s in subs):
+                self._publish(room_id, subs)
+            self.socketio.sleep(self.poll)
+
+    def _publish(self, room_id: str, subs):
+        empty = self.socketio.server.eio.get_queue_empty_exception()
+        chunks = {}
+        for sub in subs:
+            base = sub.version
+            if sub.queue.full():
+                # client trop lent : ses patches en attente ne s'enchaînent plus,
+                # il repart de la vue complète (seul le producteur remplit la file)
+                try:
+                    while True:
+                        sub.queue.get_nowait()
+                except empty:
+                    base = None
+
+            k = (sub.key, base)
+            if k not in chunks:
+                version, event, body = self.encode(room_id, sub.key, base)
+                chunks[k] = version, b"id: %d\nevent: %s\ndata: %s\n\n" % (version, event.encode(), body)
+            version, chunk = chunks[k]
+            if base == version:
+                continue
+            sub.queue.put_nowait(chunk)
+            sub.version = version